@@ -0,0 +1,42 @@
+''' Benchmarks that each run from the repo root as a module '''
+import multiprocessing
+import os
+import Queue
+import resource
+import sys
+import traceback
+
+def peak_kb():
+    ''' Peak resident memory of this process, kilobytes on linux '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def __run(timings, args, results):
+    # Hands back an error or whatever timings returned
+    try:
+        # Reading prints progress for every page
+        sys.stdout = open(os.devnull, 'w')
+        results.put((None, timings(*args)))
+    except Exception:
+        results.put((traceback.format_exc(), None))
+
+def run_alone(name, timings, *args):
+    ''' Call timings(*args) in its own process and return the result, so
+        peak memory is only what that call used
+        Exits with the error if it fails, or the process dies, name is
+        what failed '''
+    results = multiprocessing.Queue()
+    p = multiprocessing.Process(target=__run, args=(timings, args, results))
+    p.start()
+    while True:
+        try:
+            error, result = results.get(timeout=1)
+            break
+        except Queue.Empty:
+            if not p.is_alive():
+                # Killed before it could hand anything back
+                error = 'Benchmark process exited with code:%s' % p.exitcode
+                break
+    p.join()
+    if error:
+        raise SystemExit('%s failed\n%s' % (name, error))
+    return result
@@ -0,0 +1,135 @@
+''' Time reading boxscores into the database with made up pages,
+    nothing is downloaded so this runs anywhere
+    Run from the repo root;
+    python -m benchmarks.ingest --games 500 '''
+import argparse
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import read_score
+
+import benchmarks
+from benchmarks import pages
+from client import archive
+from client import persist
+from client import soup
+from client import store
+from client import utils
+
+STAGE_PARSE = 'parse'
+STAGE_PERSIST = 'persist'
+STAGE_INGEST = 'ingest'
+STAGES = [STAGE_PARSE, STAGE_PERSIST, STAGE_INGEST]
+
+def __add_boxscores(cursor, saved):
+    # Rows download_scores would have made, pages already saved
+    store.insert_many(cursor, 'boxscore',
+                      [(link, archive.normalize(file_name), utils.DOWNLOAD_SAVED) \
+                       for (link, file_name) in saved],
+                      columns=['link', 'html_path', 'download_state'])
+
+def __games(saved, parser):
+    # Games are not kept, so memory is only ever one game
+    # Yields the size of each page and the game read from it
+    for (link, file_name) in saved:
+        with open(file_name) as f:
+            data = f.read()
+        yield len(data), read_score.parse_page(data, link, parser=parser)
+
+def __check_size(page_size, game):
+    # Games are handed between processes when parsing in parallel, one
+    # that still links to the page tree pickles bigger than the page
+    if len(pickle.dumps(game, pickle.HIGHEST_PROTOCOL)) > page_size:
+        raise Exception('Game pickles bigger than its page:%s' % game.link)
+
+def __timings(stage, saved, directory, parser, bulk):
+    database = os.path.join(directory, '%s.sql' % stage)
+    with utils.connect_sql(database, bulk=bulk) as sql_connection:
+        cursor = sql_connection.cursor()
+        utils.create_tables(cursor, bulk=bulk)
+        __add_boxscores(cursor, saved)
+        sql_connection.commit()
+        start = time.time()
+        if stage == STAGE_PARSE:
+            # Size checks are not timed
+            seconds = 0
+            for (page_size, game) in __games(saved, parser):
+                seconds += time.time() - start
+                __check_size(page_size, game)
+                start = time.time()
+        elif stage == STAGE_PERSIST:
+            # Only time saving, each game is parsed just before
+            persist.preload_known(cursor)
+            seconds = 0
+            for (_, game) in __games(saved, parser):
+                start = time.time()
+                persist.save_game(cursor, game)
+                seconds += time.time() - start
+            start = time.time()
+            sql_connection.commit()
+            seconds += time.time() - start
+        else:
+            _, _, failed = read_score.read_files([f for (_, f) in saved], cursor,
+                                                 parser=parser)
+            if failed:
+                raise Exception('Failed to read %d files' % len(failed))
+            seconds = time.time() - start
+        start = time.time()
+    # Bulk mode builds indexes as the connection closes
+    return seconds, time.time() - start, benchmarks.peak_kb()
+
+def benchmark(stage, saved, directory, parser=None, bulk=False):
+    ''' Returns seconds for the stage, seconds to close the database
+        after it, and peak memory of the stage in kilobytes '''
+    return benchmarks.run_alone('Stage %s' % stage, __timings,
+                                stage, saved, directory, parser, bulk)
+
+def parse_args():
+    a = argparse.ArgumentParser(description='Time reading made up boxscores')
+    a.add_argument('--games', type=int, default=200,
+                   help='Number of games to make up')
+    a.add_argument('--seed', type=int, default=0,
+                   help='First seed for made up games, same seed same games')
+    a.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES,
+                   help='Stages to time; parse is html to games, persist '
+                        'is games to the database, ingest is files to the '
+                        'database with read_score')
+    a.add_argument('--parser', default=soup.DEFAULT_PARSER, choices=soup.PARSERS,
+                   help='HTML parser to build pages with')
+    a.add_argument('--bulk', action='store_true',
+                   help='Use bulk load database settings')
+    a.add_argument('--keep',
+                   help='Write pages and databases here and keep them, '
+                        'default is a temporary directory')
+    return a.parse_args()
+
+def main():
+    args = vars(parse_args())
+    # Only results are printed, the schema lists some tables twice and
+    # creating those logs errors for every stage
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s",
+                        level=logging.CRITICAL)
+    directory = args['keep'] or tempfile.mkdtemp(prefix='boxscores-benchmark-')
+    try:
+        saved = pages.write_pages(os.path.join(directory, 'boxes'), args['games'],
+                                  seed=args['seed'])
+        print 'Games:%d Parser:%s Bulk:%s' % (len(saved), args['parser'], args['bulk'])
+        print '%-8s %10s %10s %10s %10s %10s' % ('stage', 'seconds', 'ms/game',
+                                                'games/sec', 'peak kb', 'close s')
+        for stage in args['stages']:
+            seconds, close, peak = benchmark(stage, saved, directory,
+                                             parser=args['parser'],
+                                             bulk=args['bulk'])
+            print '%-8s %10.2f %10.2f %10.1f %10d %10.2f' % \
+                  (stage, seconds, seconds * 1000 / len(saved),
+                   len(saved) / seconds if seconds else 0, peak, close)
+    finally:
+        if not args['keep']:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
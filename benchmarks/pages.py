@@ -0,0 +1,210 @@
+''' Made up boxscore pages laid out like baseball-reference pages, so
+    read_score can be timed without the network
+    Rosters, extra innings, attendance and start time vary by game '''
+import calendar
+import random
+
+from client import archive
+from client import utils
+
+# Short name on the page, code used in boxscore links
+TEAMS = [('LAA', 'ANA'), ('BOS', 'BOS'), ('NYY', 'NYA'), ('CHC', 'CHN'),
+         ('LAD', 'LAN'), ('SFG', 'SFN'), ('STL', 'SLN'), ('TEX', 'TEX')]
+
+FIRST_NAMES = ['Mike', 'Albert', 'Josh', 'Chris', 'David', 'Kole', 'Erick',
+               'Howie', 'Jered', 'Joe', 'Dustin', 'Xander']
+LAST_NAMES = ['Trout', 'Pujols', 'Hamilton', 'Iannetta', 'Freese', 'Calhoun',
+              'Aybar', 'Kendrick', 'Weaver', 'Smith', 'Ortiz', 'Pedroia',
+              'Napoli', 'Victorino', 'Nava', 'Bogaerts', 'Lester', 'Uehara']
+POSITIONS = ['C', '1B', '2B', '3B', 'SS', 'LF', 'CF', 'RF', 'PH-DH', 'PR-2B']
+
+# Columns of each table, in page order, the same as the site
+HITTING_COLUMNS = ['player', 'ab', 'r', 'h', 'rbi', 'bb', 'so', 'pa',
+                   'batting_avg', 'onbase_perc', 'slugging_perc',
+                   'onbase_plus_slugging', 'pitches', 'strikes_total',
+                   'wpa_bat', 'leverage_index_avg', 're24_bat', 'po', 'a',
+                   'details']
+PITCHING_COLUMNS = ['player', 'ip', 'h', 'r', 'er', 'bb', 'so', 'hr',
+                    'earned_run_avg', 'batters_faced', 'pitches',
+                    'strikes_total', 'strikes_contact', 'strikes_swinging',
+                    'strikes_looking', 'inplay_gb_total', 'inplay_fb_total',
+                    'inplay_ld', 'inplay_unk', 'game_score',
+                    'inherited_runners', 'inherited_score', 'wpa_def',
+                    'leverage_index_avg', 're24_def']
+LINEUP_COLUMNS = ['bop_visitor', 'player_visitor', 'bop_home', 'player_home']
+
+def __player(team, number):
+    # Same team and number is always the same player, so games share players
+    first = FIRST_NAMES[number % len(FIRST_NAMES)]
+    last = LAST_NAMES[(number * 7 + len(team)) % len(LAST_NAMES)] + team.capitalize()
+    link = '/players/%s/%s%s%s%02d.shtml' % (last[0].lower(), last[:5].lower(),
+                                              first[:2].lower(), team.lower(), number)
+    return first, last, link
+
+def __roster(rng, team):
+    # At least nine hitters to fill the lineup
+    hitters = [__player(team, n) for n in rng.sample(range(30), rng.randint(9, 16))]
+    pitchers = [__player(team, n) for n in rng.sample(range(30, 45), rng.randint(2, 7))]
+    return hitters, pitchers
+
+def __innings(rng):
+    # Runs each inning, extra innings until someone wins
+    away = [rng.choice([0, 0, 0, 1, 1, 2, 3]) for _ in range(9)]
+    home = [rng.choice([0, 0, 0, 1, 1, 2, 3]) for _ in range(9)]
+    while sum(away) == sum(home):
+        away.append(rng.choice([0, 0, 1]))
+        home.append(rng.choice([0, 0, 1]))
+    # Home team ahead never bats in the last inning
+    skip_last = sum(home) - home[-1] > sum(away)
+    if skip_last:
+        home[-1] = 0
+    return away, home, skip_last
+
+def __table(table_id, columns, rows):
+    head = ''.join('<th data-stat="%s">%s</th>' % (c, c) for c in columns)
+    body = ''.join('<tr class="normal_text">%s</tr>' % ''.join(row) for row in rows)
+    return '<table class="stats_table" id="%s"><thead><tr class="normal_text">%s' \
+           '</tr></thead><tbody>%s</tbody></table>' % (table_id, head, body)
+
+def __hitting_row(rng, player):
+    row = []
+    for column in HITTING_COLUMNS:
+        if column == 'player':
+            row.append('<td><a href="%s">%s %s</a> %s</td>' % \
+                       (player[2], player[0], player[1], rng.choice(POSITIONS)))
+        elif column == 'ab':
+            row.append('<td><b>%d</b></td>' % rng.randint(0, 5))
+        elif column == 'details' or rng.random() < 0.05:
+            row.append('<td></td>')
+        else:
+            row.append('<td>%d</td>' % rng.randint(0, 4))
+    return row
+
+def __pitching_row(rng, player):
+    row = []
+    for column in PITCHING_COLUMNS:
+        if column == 'player':
+            row.append('<td><a href="%s">%s %s</a>, W (1-0)</td>' % \
+                       (player[2], player[0], player[1]))
+        elif column == 'ip':
+            row.append('<td><b>%d.%d</b></td>' % (rng.randint(0, 6), rng.randint(0, 2)))
+        else:
+            row.append('<td>%d</td>' % rng.randint(0, 30))
+    return row
+
+def __small_text(rng, side, hitters, left_on_base):
+    def name(player):
+        return '%s %s' % (player[0][0], player[1])
+    picks = rng.sample(hitters, 4)
+    text = '<div id="2b%s"><strong>2B:</strong> %s (5); %s 2 (3).</div>' % \
+           (side, name(picks[0]), name(picks[1]))
+    text += '<div id="hr%s"><strong>HR:</strong> %s (1, off X Y).</div>' % \
+            (side, name(picks[2]))
+    text += '<div id="tb%s"><strong>TB:</strong> %s 4.</div>' % (side, name(picks[2]))
+    if rng.random() < 0.7:
+        text += '<div id="gidp%s"><strong>GIDP:</strong> %s (2).</div>' % \
+                (side, name(picks[3]))
+    text += '<div id="teamlob%s"><strong>Team LOB:</strong> %d.</div>' % \
+            (side, left_on_base)
+    return text
+
+def game_page(seed, year=2014):
+    ''' Key and html of one made up game, the same for the same seed '''
+    rng = random.Random(seed)
+    away, home = rng.sample(TEAMS, 2)
+    month = rng.randint(4, 9)
+    day = rng.randint(1, calendar.monthrange(year, month)[1])
+    key = '%s%d%02d%02d%d' % (home[1], year, month, day, seed % 10)
+    rosters = [__roster(rng, away[0]), __roster(rng, home[0])]
+    away_runs, home_runs, skip_last = __innings(rng)
+    scores = [sum(away_runs), sum(home_runs)]
+
+    start = ' ' if rng.random() < 0.1 else '%d:%02dPM' % (rng.randint(1, 9), rng.randint(0, 59))
+    date = '%s, %s %d, %d, %s' % (calendar.day_name[calendar.weekday(year, month, day)],
+                                  calendar.month_name[month], day, year, start)
+    attendance = 'Not Given' if rng.random() < 0.1 else '{:,}'.format(rng.randint(5000, 55000))
+    game_time = '%d:%02d' % (rng.randint(2, 4), rng.randint(0, 59))
+
+    teams = ''
+    for (count, team) in enumerate([away, home]):
+        teams += '<div class="team"><span>%s</span><div>%d</div><div>10-5</div>' \
+                 '<div>x</div><div>y</div><div><a href="/managers/%smgr01.shtml">' \
+                 'Manager %s</a></div></div>' % (team[0], scores[count],
+                                                 team[1].lower(), team[0])
+        if count == 0:
+            teams += '<span>at</span>'
+    winner, loser = (rosters[0], rosters[1]) if scores[0] > scores[1] else (rosters[1], rosters[0])
+    pitchers = [('WP', winner[1][0]), ('LP', loser[1][0])]
+    if rng.random() < 0.5:
+        pitchers.append(('SV', winner[1][-1]))
+    decisions = ''.join('<div><strong>%s:</strong> <a href="%s">%s %s</a></div>' % \
+                        (label, p[2], p[0], p[1]) for (label, p) in pitchers)
+    linescore = '<pre id="linescore">   %s\n' % \
+                ' '.join(str(i + 1) for i in range(len(away_runs)))
+    for (count, (team, runs)) in enumerate([(away, away_runs), (home, home_runs)]):
+        innings = [str(r) for r in runs]
+        if count == 1 and skip_last:
+            innings[-1] = 'X'
+        linescore += '<span><a href="/teams/%s/%d.shtml">%s</a></span> %s ' \
+                     '<strong>%d %d %d</strong>\n' % \
+                     (team[0], year, team[0], ' '.join(innings), scores[count],
+                      scores[count] + rng.randint(3, 8), rng.randint(0, 3))
+    linescore += '</pre>'
+
+    page = ['<html><body><div id="page_content">',
+            '<table class="stats_table" id="other"><tr><td>Other game</td></tr></table>',
+            '<div id="game"><div><div id="meta"><div>%s</div><div>, %s Park</div>'
+            '<div>Attendance: %s, Time of Game: %s</div></div></div>'
+            '<table><tr><td align="center"><div id="teams">%s<div class="decisions">'
+            '<div>%s</div></div></div>%s</td></tr></table></div>' % \
+            (date, home[0], attendance, game_time, teams, decisions, linescore)]
+    totals = ['<td><strong>Team Totals</strong></td>']
+    for (count, roster) in enumerate(rosters):
+        page.append(__table('bat%d' % count, HITTING_COLUMNS,
+                            [__hitting_row(rng, p) for p in roster[0]] + \
+                            [totals + ['<td>1</td>'] * (len(HITTING_COLUMNS) - 1)]))
+    for (count, roster) in enumerate(rosters):
+        page.append(__table('pit%d' % count, PITCHING_COLUMNS,
+                            [__pitching_row(rng, p) for p in roster[1]] + \
+                            [totals + ['<td>1</td>'] * (len(PITCHING_COLUMNS) - 1)]))
+    lineup = []
+    for order in range(9):
+        lineup.append(['<td>%d</td>' % (order + 1),
+                       '<td><a href="%s">x</a></td>' % rosters[0][0][order][2],
+                       '<td>%d</td>' % (order + 1),
+                       '<td><a href="%s">x</a></td>' % rosters[1][0][order][2]])
+    # Starting pitchers, no batting order
+    lineup.append(['<td></td>', '<td><a href="%s">x</a></td>' % rosters[0][1][0][2],
+                   '<td></td>', '<td><a href="%s">x</a></td>' % rosters[1][1][0][2]])
+    page.append(__table('lineups', LINEUP_COLUMNS, lineup))
+    page.append('<div class="small_text">%s%s</div>' % \
+                (__small_text(rng, 'visitor', rosters[0][0], rng.randint(2, 12)),
+                 __small_text(rng, 'home', rosters[1][0], rng.randint(2, 12))))
+    page.append('<div class="small_text" id="umpires"><strong>Umpires:</strong> '
+                'HP - Joe West, 1B - Bob Davidson, 2B - Angel Hernandez, '
+                '3B - CB Bucknor.</div>')
+    page.append('<div class="small_text" id="weather"><strong>Weather:</strong> '
+                '%d degrees, Wind %dmph, Sunny.</div>' % \
+                (rng.randint(45, 95), rng.randint(0, 20)))
+    page.append('</div></body></html>')
+    return key, '\n'.join(page)
+
+def game_pages(games, seed=0, year=2014):
+    ''' Key and html of games made up games, keys are never repeated '''
+    keys = set()
+    count = seed
+    while len(keys) < games:
+        key, html = game_page(count, year=year)
+        count += 1
+        if key not in keys:
+            keys.add(key)
+            yield key, html
+
+def write_pages(path, games, seed=0, year=2014):
+    ''' Save made up games under path, laid out like a downloaded archive
+        Returns the link and file name of each game '''
+    html_archive = archive.DirectoryArchive(path)
+    saved = []
+    for (key, html) in game_pages(games, seed=seed, year=year):
+        saved.append((utils.boxscore_link(key), html_archive.save(key, html)))
+    return saved
@@ -0,0 +1,67 @@
+''' Compare HTML parsers on saved boxscore pages
+    Run from the repo root;
+    python -m benchmarks.parse_pages boxscores/ --limit 200 '''
+import argparse
+import time
+
+import read_score
+
+import benchmarks
+from client import archive
+from client import soup
+
+def __timings(pages, parser, strained):
+    only = soup.BOXSCORE_CONTENT if strained else None
+    before = benchmarks.peak_kb()
+    start = time.time()
+    for data in pages:
+        soup.make_soup(data, parser=parser, only=only)
+    tree_time = time.time() - start
+    tree_peak = benchmarks.peak_kb() - before
+
+    start = time.time()
+    if strained:
+        for data in pages:
+            read_score.parse_page(data, 'benchmark', parser=parser)
+    parse_time = time.time() - start
+    return tree_time, tree_peak, parse_time
+
+def benchmark(pages, parser, strained):
+    ''' Returns seconds to build every tree, peak memory in kilobytes
+        while building them, and seconds to fully parse every page '''
+    return benchmarks.run_alone('Parser %s' % parser, __timings,
+                                pages, parser, strained)
+
+def parse_args():
+    a = argparse.ArgumentParser(description='Time HTML parsers on boxscore pages')
+    a.add_argument('file_names', nargs='+',
+                   help='Pages to read, can be directories, globs, '
+                        'pack archives or pack:// locations')
+    a.add_argument('--parsers', nargs='+', default=[soup.PARSER_LXML, soup.PARSER_HTML],
+                   choices=soup.PARSERS, help='Parsers to compare')
+    a.add_argument('--limit', type=int, default=100,
+                   help='Most pages to read')
+    return a.parse_args()
+
+def main():
+    args = vars(parse_args())
+    pages = [archive.read_page(f) for f in
+             read_score.find_files(args['file_names'])[:args['limit']]]
+    if not pages:
+        raise SystemExit('No pages found')
+    print 'Pages:%d' % len(pages)
+    print '%-12s %-8s %12s %12s %14s' % ('parser', 'content', 'tree ms/page',
+                                         'peak kb', 'parse ms/page')
+    for parser in args['parsers']:
+        for strained in [False, True]:
+            tree_time, tree_peak, parse_time = benchmark(pages, parser, strained)
+            parse_ms = '-'
+            if strained:
+                # Parsing always uses page content only
+                parse_ms = '%.2f' % (parse_time * 1000 / len(pages))
+            print '%-12s %-8s %12.2f %12d %14s' % \
+                  (parser, 'only' if strained else 'all',
+                   tree_time * 1000 / len(pages), tree_peak, parse_ms)
+
+if __name__ == '__main__':
+    main()
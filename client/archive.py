@@ -0,0 +1,206 @@
+import logging
+import os
+import zlib
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_DIRECTORY = 'directory'
+ARCHIVE_PACK = 'pack'
+# Pages are not kept, only useful when pages are parsed as downloaded
+ARCHIVE_NONE = 'none'
+ARCHIVE_KINDS = [ARCHIVE_DIRECTORY, ARCHIVE_PACK, ARCHIVE_NONE]
+
+# Pages saved in a pack archive are located with
+# pack://[Archive Dir]#[Boxscore Key]
+PACK_PREFIX = 'pack://'
+PACK_INDEX = 'index'
+PACK_NAME = 'pack-%04d.pack'
+# Start a new pack once the current one gets this big
+PACK_MAX_SIZE = 256 * 1024 * 1024
+
+class DirectoryArchive(object):
+    ''' One uncompressed .shtml file per boxscore '''
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0755)
+
+    def save(self, key, data):
+        save_path = os.path.join(self.path, key + '.shtml')
+        with open(save_path, 'w+') as f:
+            f.write(data)
+        return save_path
+
+    def contains(self, location):
+        return os.path.isfile(location)
+
+    def read(self, location):
+        with open(location, 'r') as f:
+            return f.read()
+
+    def close(self):
+        # Nothing held open
+        return
+
+class NullArchive(object):
+    ''' Throws pages away, nothing is saved '''
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def save(self, key, data):
+        return None
+
+    def contains(self, location):
+        return False
+
+    def read(self, location):
+        raise IOError('Pages are not archived:%s' % location)
+
+    def close(self):
+        return
+
+class PackArchive(object):
+    ''' Boxscores compressed and appended to a few large pack files
+        An index file has the pack number, offset and length of each page
+        Index line format; [Key]\t[Pack]\t[Offset]\t[Length] '''
+
+    def __init__(self, path, max_pack_size=PACK_MAX_SIZE):
+        self.path = os.path.abspath(path)
+        self.max_pack_size = max_pack_size
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0755)
+        # Key -> (pack, offset, length)
+        self.index = dict()
+        self.pack_number = 0
+        index_path = os.path.join(self.path, PACK_INDEX)
+        if os.path.isfile(index_path):
+            with open(index_path, 'r') as f:
+                for line in f:
+                    try:
+                        key, pack, offset, length = line.rstrip('\n').split('\t')
+                    except ValueError:
+                        # Partial line from a crash, page never indexed
+                        continue
+                    self.index[key] = (int(pack), int(offset), int(length))
+                    self.pack_number = max(self.pack_number, int(pack))
+        self.__readers = dict()
+        self.__writer = None
+        self.__index_writer = None
+
+    def __pack_path(self, pack):
+        return os.path.join(self.path, PACK_NAME % pack)
+
+    def location(self, key):
+        return '%s%s#%s' % (PACK_PREFIX, self.path, key)
+
+    def save(self, key, data):
+        if self.__writer is None:
+            self.__writer = open(self.__pack_path(self.pack_number), 'ab')
+            self.__index_writer = open(os.path.join(self.path, PACK_INDEX), 'a')
+        self.__writer.seek(0, os.SEEK_END)
+        if self.__writer.tell() >= self.max_pack_size:
+            self.__writer.close()
+            self.pack_number += 1
+            log.info('Starting pack:%d in archive:%s' % (self.pack_number, self.path))
+            self.__writer = open(self.__pack_path(self.pack_number), 'ab')
+        compressed = zlib.compress(data)
+        offset = self.__writer.tell()
+        self.__writer.write(compressed)
+        self.__writer.flush()
+        # Only index the page once all of it is in the pack
+        self.__index_writer.write('%s\t%d\t%d\t%d\n' % \
+                                  (key, self.pack_number, offset, len(compressed)))
+        self.__index_writer.flush()
+        self.index[key] = (self.pack_number, offset, len(compressed))
+        return self.location(key)
+
+    def contains(self, location):
+        return location.split('#')[-1] in self.index
+
+    def read(self, location):
+        pack, offset, length = self.index[location.split('#')[-1]]
+        try:
+            reader = self.__readers[pack]
+        except KeyError:
+            reader = open(self.__pack_path(pack), 'rb')
+            self.__readers[pack] = reader
+        reader.seek(offset)
+        return zlib.decompress(reader.read(length))
+
+    def keys(self):
+        return self.index.keys()
+
+    def close(self):
+        for f in self.__readers.values() + [self.__writer, self.__index_writer]:
+            if f is not None:
+                f.close()
+        self.__readers = dict()
+        self.__writer = None
+        self.__index_writer = None
+
+# Pack archives already opened for reading, keyed by path
+__pack_archives = dict()
+
+def open_archive(path, kind=ARCHIVE_DIRECTORY):
+    if kind == ARCHIVE_PACK:
+        return PackArchive(path)
+    if kind == ARCHIVE_DIRECTORY:
+        return DirectoryArchive(path)
+    if kind == ARCHIVE_NONE:
+        return NullArchive(path)
+    raise ValueError('Unknown archive kind:%s' % kind)
+
+def __archive_for(location):
+    if not location.startswith(PACK_PREFIX):
+        return None
+    path = location[len(PACK_PREFIX):].split('#')[0]
+    try:
+        return __pack_archives[path]
+    except KeyError:
+        pack = PackArchive(path)
+        __pack_archives[path] = pack
+        return pack
+
+def find_pages(path):
+    ''' Locations of every page under path, path can be a pack archive,
+        a directory of pages, or a single page '''
+    if path.startswith(PACK_PREFIX):
+        return [path]
+    if os.path.isfile(os.path.join(path, PACK_INDEX)):
+        pack = PackArchive(path)
+        return [pack.location(key) for key in sorted(pack.keys())]
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path)) \
+                if name.endswith('.shtml')]
+    return [path]
+
+def normalize(location):
+    ''' Location as an archive saves it, so it matches boxscore.html_path '''
+    if location.startswith(PACK_PREFIX):
+        path, key = location[len(PACK_PREFIX):].split('#')
+        return '%s%s#%s' % (PACK_PREFIX, os.path.abspath(path), key)
+    return os.path.abspath(location)
+
+def page_key(location):
+    ''' Boxscore key a page was saved under, such as BOS201404010 '''
+    if location.startswith(PACK_PREFIX):
+        return location.split('#')[-1]
+    return os.path.splitext(os.path.basename(location))[0]
+
+def contains(location):
+    ''' Check a page saved by any archive is still there '''
+    pack = __archive_for(location)
+    if pack is None:
+        return os.path.isfile(location)
+    return pack.contains(location)
+
+def read_page(location):
+    ''' Read a page saved by any archive, location is the value
+        saved to boxscore.html_path '''
+    pack = __archive_for(location)
+    if pack is None:
+        with open(location, 'r') as f:
+            return f.read()
+    return pack.read(location)
@@ -0,0 +1,124 @@
+import logging
+
+from tornado import gen
+from tornado import httpclient
+from tornado import ioloop
+from tornado import queues
+from tornado.concurrent import Future
+
+from client import fetch
+from client import ratelimit
+
+log = logging.getLogger(__name__)
+
+def _decode(response):
+    # Use charset from the content type when the site sends one
+    charset = 'utf-8'
+    content_type = response.headers.get('Content-Type', '')
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            charset = value.strip('"\'')
+    return response.body.decode(charset, 'replace')
+
+class AsyncFetcher(object):
+    ''' Fetch pages with tornado on a single event loop
+        Same interface as fetch.ThreadedFetcher, but max_requests only
+        bounds the number of requests in flight, which is much cheaper
+        than a thread per request. Handler runs on the event loop, so
+        it is still the only thing writing to disk or the database '''
+
+    def __init__(self, max_requests=10, timeout=None, headers=None,
+                 rate=None, retries=ratelimit.DEFAULT_RETRIES):
+        self.max_requests = max(1, max_requests)
+        self.timeout = timeout
+        self.headers = dict(fetch.SESSION_HEADERS)
+        if headers:
+            self.headers.update(headers)
+        if rate is None:
+            rate = ratelimit.RateLimiter()
+        self.rate = rate
+        self.retries = retries
+
+    def run(self, jobs, handler):
+        ''' Jobs are (url, context) tuples
+            handler(url, context, text) is called once per page, in the
+            order they finish, and can return more jobs to fetch
+            Text is None if the page could not be fetched '''
+        loop = ioloop.IOLoop.current()
+        loop.run_sync(lambda: self.__run(jobs, handler))
+
+    @gen.coroutine
+    def __get_page(self, client, url):
+        kwargs = {'headers' : self.headers,
+                  'decompress_response' : True}
+        if self.timeout is not None:
+            kwargs['request_timeout'] = self.timeout
+        for attempt in range(self.retries + 1):
+            delay = self.rate.reserve()
+            if delay > 0:
+                yield gen.sleep(delay)
+            try:
+                response = yield client.fetch(url, **kwargs)
+            except httpclient.HTTPError as e:
+                # Code 599 is a connection error or timeout
+                if e.code != 599 and e.code not in ratelimit.RETRY_STATUS:
+                    # Not worth retrying, such as a 404, leave the page
+                    # for a resumed run instead of stopping
+                    self.rate.success()
+                    log.error('Unable to fetch url:%s, %s' % (url, e))
+                    raise gen.Return(None)
+                pause = None
+                if e.response is not None:
+                    pause = ratelimit.retry_after(e.response.headers)
+                if e.code == 599 or e.code in ratelimit.THROTTLE_STATUS:
+                    self.rate.throttled(pause)
+                error = e
+            except Exception as e:
+                # Refused, reset or unresolved connections, same as a 599
+                self.rate.throttled()
+                error = e
+            else:
+                self.rate.success()
+                raise gen.Return(_decode(response))
+            if attempt < self.retries:
+                delay = ratelimit.backoff_delay(attempt)
+                log.warning('Error fetching url:%s, %s, retrying in %.1f seconds' % \
+                            (url, error, delay))
+                yield gen.sleep(delay)
+        # Dont stop the whole crawl over one page
+        log.error('Giving up on url:%s, %s' % (url, error))
+        raise gen.Return(None)
+
+    @gen.coroutine
+    def __run(self, jobs, handler):
+        client = httpclient.AsyncHTTPClient(force_instance=True,
+                                            max_clients=self.max_requests)
+        queue = queues.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        failed = Future()
+
+        @gen.coroutine
+        def worker():
+            while True:
+                url, context = yield queue.get()
+                try:
+                    text = yield self.__get_page(client, url)
+                    for job in handler(url, context, text) or []:
+                        queue.put_nowait(job)
+                except Exception as e:
+                    log.error('Error fetching url:%s, %s' % (url, e))
+                    if not failed.done():
+                        failed.set_exception(e)
+                finally:
+                    queue.task_done()
+
+        for _ in range(self.max_requests):
+            worker()
+        try:
+            # Finish once every job is done, or stop on first error
+            wait = gen.WaitIterator(queue.join(), failed)
+            yield wait.next()
+        finally:
+            client.close()
@@ -1,107 +1,349 @@
-from bs4 import BeautifulSoup
+from collections import OrderedDict
 from datetime import date
 import logging
 import requests
-import os
 import sys
 import sqlite3
+import time
 
+from client import archive
+from client import fetch
+from client import ratelimit
+from client import soup
+from client import store
 from client import utils
 
 log = logging.getLogger(__name__)
 
-class DownloadClient(object):
+# Kinds of pages crawled
+YEAR_PAGE = 'year'
+SCHEDULE_PAGE = 'schedule'
+BOXSCORE_PAGE = 'boxscore'
+
+class _Season(object):
+    ''' Crawl state for one year '''
 
     def __init__(self, year):
         self.year = year
+        # Map of boxscore link -> names of teams with that game
+        self.boxscore_links = OrderedDict()
+        # Schedules still being read, and ones read successfully
+        self.pending = set()
+        self.collected = []
+
+class DownloadClient(object):
 
-    def __check_results(self, request, msg=None):
+    def __init__(self, years, workers=1, session=None, timeout=None,
+                 resume=False, archive_kind=archive.ARCHIVE_DIRECTORY,
+                 engine=fetch.ENGINE_THREADS, rate=None,
+                 retries=ratelimit.DEFAULT_RETRIES, ingest=None, parser=None):
+        # Can be a single year or a list of them
+        if isinstance(years, int):
+            years = [years]
+        self.years = list(years)
+        # Skip any work a previous run already saved
+        self.resume = resume
+        # How saved pages are stored, see client.archive
+        self.archive_kind = archive_kind
+        # Called as ingest(text, cursor, link) with each boxscore page
+        # as soon as it is downloaded, so pages are parsed in memory
+        self.ingest = ingest
+        # HTML parser for year and schedule pages, see client.soup
+        self.parser = parser
+        self.timeout = timeout
+        # Pacing shared by every worker, see client.ratelimit
+        if rate is None:
+            rate = ratelimit.RateLimiter()
+        self.rate = rate
+        self.retries = retries
+        if engine == fetch.ENGINE_ASYNC:
+            # Only import tornado if the async engine is used
+            from client import async_fetch
+            # Workers here is the number of requests in flight at once
+            self.session = None
+            self.fetcher = async_fetch.AsyncFetcher(max_requests=workers,
+                                                    timeout=timeout,
+                                                    rate=rate,
+                                                    retries=retries)
+        else:
+            # One session for the whole run, pool sized to match workers
+            if session is None:
+                session = fetch.create_session(pool_size=workers)
+            self.session = session
+            self.fetcher = fetch.ThreadedFetcher(self.__get_page,
+                                                 workers=workers)
+
+    def __get_page(self, url):
+        for attempt in range(self.retries + 1):
+            self.rate.wait()
+            try:
+                r = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                # Connection errors and timeouts, site may be overloaded
+                self.rate.throttled()
+                error = e
+            else:
+                if r.status_code not in ratelimit.RETRY_STATUS:
+                    # Site answered, so pacing is fine either way
+                    self.rate.success()
+                    if r.status_code >= 400:
+                        # Not worth retrying, such as a 404, leave the
+                        # page for a resumed run instead of stopping
+                        log.error('Unable to fetch url:%s, %d response' % \
+                                  (url, r.status_code))
+                        return None
+                    return r.text
+                if r.status_code in ratelimit.THROTTLE_STATUS:
+                    self.rate.throttled(ratelimit.retry_after(r.headers))
+                error = requests.HTTPError('%d response' % r.status_code,
+                                           response=r)
+            if attempt < self.retries:
+                delay = ratelimit.backoff_delay(attempt)
+                log.warning('Error fetching url:%s, %s, retrying in %.1f seconds' % \
+                            (url, error, delay))
+                time.sleep(delay)
+        # Dont stop the whole crawl over one page
+        log.error('Giving up on url:%s, %s' % (url, error))
+        return None
+
+    def __check_results(self, text, msg=None):
         ''' Handle the fact that baseball-reference.com returns a "200" status code
             but an error message in the page content, rather than a legitimate HTTP
-            error response. '''
+            error response. Returns False for those pages, and pages
+            that could not be downloaded at all '''
         if not msg:
             msg = 'Unknown error retrieving page.'
-        if '404 - File Not Found' in request.text:
+        if text is None or '404 - File Not Found' in text:
             log.error('#ERROR: %s' % msg)
-            sys.exit(-1)
+            return False
+        return True
 
-    def collect_teams_and_schedules(self, cursor):
-        url = utils.BOXES_URL +'%d.shtml' % self.year
-        r = requests.get(url)
-        self.__check_results(r, msg='Unable to retrieve self.year:%s' % self.year)
-        soup = BeautifulSoup(r.text)
-        div = soup.find(id='page_content')
+    def __teams_gathered(self, year, cursor):
+        return store.teams_gathered(cursor, year)
+
+    def __collect_year(self, year, text, cursor):
+        if not self.__check_results(text, msg='Unable to retrieve year:%s' % year):
+            # Skip the year, other years can still be crawled
+            return False
+        page = soup.make_soup(text, parser=self.parser, only=soup.YEAR_CONTENT)
+        div = page.find(id='page_content')
         for i in div.find_all('a'):
             info = {'team' : str(i.contents[0]),
                     'schedule-link' : i['href']
                    }
-            log.info('Gathering info for team:%s in year:%s' % (info['team'], self.year))
+            log.info('Gathering info for team:%s in year:%s' % (info['team'], year))
             link = utils.URL_PREFIX + info['schedule-link']
 
-            query = 'INSERT INTO boxscore_meta(year, team_name, schedule_link) VALUES (%d, "%s", "%s")' %  (self.year, info['team'], link)
             try:
-                cursor.execute(query)
+                store.add_schedule(cursor, year, info['team'], link)
             except sqlite3.IntegrityError as e:
                 log.error("Cannot create table:%s" % str(e))
+        return True
 
-    def __insert_boxscore(self, link, team, html_dir, cursor):
+    def __record_boxscore_link(self, link, teams, cursor):
         # Link includes date, strip here
         # Format http://www.baseball-reference.com/boxes/[Team ID (3)]/[Team ID (3)][INFO HERE].shtml
         strip = link.split('/')[5].split('.')[0]
-
-        # User this as save dir
-        save_path = html_dir + '/' + strip + '.shtml'
         # Format is [Team Prefix (3)][Year (4)][Month (2)][Day (2)][? (1)]
         s = strip[3:][:-1]
-        self.year = int(s[0:4])
+        year = int(s[0:4])
         month = int(s[4:6])
         day = int(s[6:])
         # Say time midnight by default
         # Go back and update with specific time when data extracted
-        date_string = '%s 0:00:00' % (str(date(self.year, month, day)))
+        date_string = '%s 0:00:00' % (str(date(year, month, day)))
+
+        # Game is on both schedules, but a team can be missing from the
+        # year index, so second team can be unknown
+        team_one = teams[0]
+        team_two = teams[1] if len(teams) > 1 else None
+        try:
+            store.insert(cursor, 'boxscore',
+                         [team_one, team_two, link, date_string,
+                          utils.DOWNLOAD_PENDING],
+                         columns=['team_one_name', 'team_two_name', 'link',
+                                  'date', 'download_state'])
+        except sqlite3.IntegrityError:
+            log.debug("Cannot create record, assume link exists:%s" % link)
+            store.update(cursor, 'boxscore', [team_one, team_two],
+                         ['team_one_name', 'team_two_name'], 'link', link)
+
+    def __save_boxscore(self, link, text, html_archive, cursor):
+        strip = link.split('/')[5].split('.')[0]
 
-        # Get html and save to file
-        box = requests.get(link)
-        self.__check_results(box, msg='Unable to retrieve boxscore:%s' % link)
+        # Save html to archive
+        if not self.__check_results(text, msg='Unable to retrieve boxscore:%s' % link):
+            # Leave link pending, a resumed run will try it again
+            return
         try:
-            with open(save_path, 'w+') as f:
-                f.write(box.text.encode('utf-8'))
+            save_path = html_archive.save(strip, text.encode('utf-8'))
         except IOError:
-            log.error('Error saving file:%s' % save_path)
+            log.error('Error saving page:%s to %s' % (strip, html_archive.path))
             sys.exit(-1)
+        # No path if pages are not being archived
+        if save_path is not None:
+            store.update(cursor, 'boxscore', [save_path, utils.DOWNLOAD_SAVED],
+                         ['html_path', 'download_state'], 'link', link)
+            # Commit each page so a crashed run can resume from here
+            cursor.connection.commit()
+        if self.ingest:
+            self.__ingest_boxscore(link, text, cursor)
+
+    def __ingest_boxscore(self, link, text, cursor):
         try:
-            query = "INSERT INTO boxscore(team_one_name, team_two_name, link, html_path, date)"\
-                   " VALUES ('%s', NULL, '%s', '%s', '%s')" % (team, link, save_path, date_string)
-            cursor.execute(query)
-        except sqlite3.IntegrityError as e:
-            log.debug("Cannot create record, assume link exists")
-            log.error("%s" % str(e))
-            query = 'UPDATE boxscore SET team_two_name="%s" WHERE link="%s"' % (team, link)
-            cursor.execute(query)
-
-    def __collect_team(self, url, team, cursor, html_dir):
-        log.info('Downloading all boxscores for team:%s' % team)
-        r = requests.get(url)
-        self.__check_results(r, msg='Unable to retrieve team:%s' % url)
-        soup = BeautifulSoup(r.text)
-        for i in soup.find_all('a'):
+            self.ingest(text, cursor, link)
+        except Exception as e:
+            # Page is archived, so it can be read again once fixed
+            log.exception('Unable to ingest boxscore:%s, %s' % (link, e))
+            cursor.connection.rollback()
+            return
+        except BaseException:
+            # Interrupted, such as by Ctrl-C, a half saved game must not be
+            # committed on the way out or it looks read
+            cursor.connection.rollback()
+            raise
+        cursor.connection.commit()
+
+    def __saved_boxscores(self, year, cursor):
+        # Links from a previous run that were saved and are still on disk
+        # Previous runs may have used another kind of archive
+        # Returns map of link -> html_path
+        return dict((link, html_path) for (link, html_path) in \
+                    store.saved_boxscores(cursor, year) \
+                    if html_path and archive.contains(html_path))
+
+    def __parsed_boxscores(self, year, cursor):
+        # Links already read into the database
+        return store.parsed_links(cursor, year)
+
+    def __collect_team(self, url, team, text):
+        log.info('Gathering all boxscore links for team:%s' % team)
+        if not self.__check_results(text, msg='Unable to retrieve team:%s' % url):
+            # Schedule stays uncollected, a resumed run will try it again
+            return None
+        page = soup.make_soup(text, parser=self.parser, only=soup.SCHEDULE_LINKS)
+        links = []
+        for i in page.find_all('a'):
             href = i['href']
             # All boxscores have a link that starts with /boxes/
             if href.startswith('/boxes/') and href.endswith('.shtml'):
-                link = utils.URL_PREFIX + href
-                self.__insert_boxscore(link, team, html_dir, cursor)
+                links.append(utils.URL_PREFIX + href)
+        return links
+
+    def __schedule_jobs(self, season, cursor):
+        result = store.schedules(cursor, season.year)
+        log.info('Gathering all boxscores for year:%d' % season.year)
+
+        # Tuple returned (year, team, link, links_collected)
+        schedules = result
+        if self.resume:
+            # Links for these schedules are already in the boxscore table
+            schedules = [item for item in result if not item[3]]
+            log.info('Skipping %d schedules already gathered' % \
+                     (len(result) - len(schedules)))
+            for (link, team_one, team_two) in store.year_boxscores(cursor, season.year):
+                season.boxscore_links[link] = [t for t in (team_one, team_two) if t]
+        if not schedules:
+            return self.__boxscore_jobs(season, cursor)
+        season.pending = set(item[2] for item in schedules)
+        return [(item[2], (SCHEDULE_PAGE, season, item[1])) for item in schedules]
+
+    def __boxscore_jobs(self, season, cursor):
+        # Save all links before downloading, these are the checkpoint
+        for link, teams in season.boxscore_links.items():
+            self.__record_boxscore_link(link, teams, cursor)
+        store.mark_links_collected(cursor, season.collected)
+        cursor.connection.commit()
+
+        if self.resume:
+            saved = self.__saved_boxscores(season.year, cursor)
+            skipped = set(saved)
+            if self.ingest:
+                # Read pages already saved instead of downloading again
+                parsed = self.__parsed_boxscores(season.year, cursor)
+                for link, html_path in saved.items():
+                    if link not in parsed:
+                        self.__ingest_boxscore(link, archive.read_page(html_path),
+                                               cursor)
+                # Pages already read are done, even if never archived
+                skipped |= parsed
+            log.info('Skipping %d boxscores already downloaded or read' % \
+                     len(skipped))
+            for link in skipped:
+                season.boxscore_links.pop(link, None)
+        log.info('Downloading %d boxscores for year:%d' % \
+                 (len(season.boxscore_links), season.year))
+        return [(link, (BOXSCORE_PAGE, season, teams)) \
+                for link, teams in season.boxscore_links.items()]
+
+    def __crawl(self, jobs, cursor, html_archive, follow=True):
+        # Every page for every year goes through the one fetcher
+        # All writes happen here on the calling thread
+        # If follow, year pages lead on to schedules and boxscores
+        def handle_page(url, context, text):
+            kind, season, info = context
+            if kind == YEAR_PAGE:
+                found = self.__collect_year(season.year, text, cursor)
+                cursor.connection.commit()
+                if found and follow:
+                    return self.__schedule_jobs(season, cursor)
+                return None
+            if kind == SCHEDULE_PAGE:
+                links = self.__collect_team(url, info, text)
+                season.pending.discard(url)
+                if links is not None:
+                    season.collected.append(url)
+                    for link in links:
+                        teams = season.boxscore_links.setdefault(link, [])
+                        if info not in teams:
+                            teams.append(info)
+                # Every game is on both teams schedules, so wait for all
+                # links for the year, and download each boxscore only once
+                if not season.pending:
+                    return self.__boxscore_jobs(season, cursor)
+                return None
+            self.__save_boxscore(url, text, html_archive, cursor)
+            return None
+
+        self.fetcher.run(jobs, handle_page)
+
+    def __year_jobs(self, cursor):
+        jobs = []
+        for year in self.years:
+            if self.resume and self.__teams_gathered(year, cursor):
+                log.info('Teams already gathered for year:%d' % year)
+                continue
+            url = utils.BOXES_URL +'%d.shtml' % year
+            jobs.append((url, (YEAR_PAGE, _Season(year), None)))
+        return jobs
+
+    def collect_teams_and_schedules(self, cursor):
+        self.__crawl(self.__year_jobs(cursor), cursor, None, follow=False)
 
     def collect_team_games(self, cursor, html_dir):
-        query = 'SELECT year,team_name,schedule_link from boxscore_meta where year=%d' % self.year
-        cursor.execute(query)
-        html_save = os.path.abspath(html_dir)
-        # Make dir if needed
-        if not os.path.isdir(html_dir):
-            os.mkdir(html_dir, 0755)
-        result = cursor.fetchall()
-        log.info('Gathering all boxscores for self.year:%d' % self.year)
-        for item in result:
-            # Tuple returned (self.year, team, link)
-            url = item[2]
-            team = item[1]
-            self.__collect_team(url, team, cursor, html_save)
+        # Makes dir if needed
+        html_archive = archive.open_archive(html_dir, kind=self.archive_kind)
+        jobs = []
+        for year in self.years:
+            jobs += self.__schedule_jobs(_Season(year), cursor)
+        try:
+            self.__crawl(jobs, cursor, html_archive)
+        finally:
+            html_archive.close()
+
+    def collect_all(self, cursor, html_dir):
+        ''' Crawl every year in one pass, years, schedules and boxscores
+            all share the fetcher, so boxscores for one year download
+            while schedules for later years are still being read '''
+        html_archive = archive.open_archive(html_dir, kind=self.archive_kind)
+        jobs = self.__year_jobs(cursor)
+        if self.resume:
+            # Years already in the database go straight to schedules
+            queued = set(context[1].year for (url, context) in jobs)
+            for year in self.years:
+                if year not in queued:
+                    jobs += self.__schedule_jobs(_Season(year), cursor)
+        try:
+            self.__crawl(jobs, cursor, html_archive)
+        finally:
+            html_archive.close()
@@ -0,0 +1,188 @@
+''' Player game records as one fixed width binary file per column
+    Every file holds the same number of rows, in the same order, so
+    analysis code can memory map them, for example with numpy;
+
+        manifest = json.load(open('export/manifest.json'))
+        info = manifest['columns']['hits']
+        hits = numpy.memmap('export/' + info['file'], dtype=info['dtype'],
+                            mode='r', shape=(manifest['rows'],)) '''
+from array import array
+import hashlib
+import json
+import logging
+import os
+import sys
+
+from client import records
+
+log = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+# Numpy dtype strings, always written little endian
+INT32 = '<i4'
+INT8 = '<i1'
+# Integers can be NULL in the database, written as this instead
+NULL_INT32 = -2 ** 31
+
+# Text columns are written as codes, the value for a code is line
+# number [code] of the column's values file
+CODED_COLUMNS = ['player_link', 'fielding_pos']
+STAT_COLUMNS = [c for c in records.PLAYER_LINE_COLUMNS if c not in CODED_COLUMNS]
+
+def date_number(date):
+    ''' Date saved as [Year]-[Month]-[Day] [Time] as YYYYMMDD, 0 if missing '''
+    if not date:
+        return 0
+    year, month, day = date.split(' ')[0].split('-')
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+class __Column(object):
+    ''' Buffers values, written to the column file every flush '''
+
+    def __init__(self, path, name, typecode, dtype, null=None):
+        self.name = name
+        self.file_name = name + '.bin'
+        self.dtype = dtype
+        self.null = null
+        self.typecode = typecode
+        self.values = array(typecode)
+        self.f = open(os.path.join(path, self.file_name), 'wb')
+
+    def append(self, value):
+        if value is None:
+            value = self.null
+        self.values.append(value)
+
+    def flush(self):
+        if sys.byteorder != 'little':
+            self.values.byteswap()
+        self.values.tofile(self.f)
+        self.values = array(self.typecode)
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+    def describe(self):
+        info = {'file' : self.file_name, 'dtype' : self.dtype}
+        if self.null is not None:
+            info['null'] = self.null
+        return info
+
+class __Codes(object):
+    ''' Text values as codes, codes start at 0 in order first seen '''
+
+    def __init__(self):
+        self.codes = dict()
+        self.values = []
+
+    def code(self, value):
+        try:
+            return self.codes[value]
+        except KeyError:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+            return code
+
+    def write(self, path, name):
+        file_name = name + '.txt'
+        with open(os.path.join(path, file_name), 'w') as f:
+            for value in self.values:
+                f.write((value or '').encode('utf-8') + '\n')
+        return file_name
+
+def __load_games(cursor, codes):
+    # Team record -> (game code, date, home) for every game read
+    cursor.execute('CREATE TEMP TABLE export_team_game(team_id INTEGER PRIMARY KEY,'
+                   ' game INTEGER, date INTEGER, home INTEGER)')
+    cursor.execute('SELECT link, date, away_team_game_record, home_team_game_record'
+                   ' FROM boxscore WHERE away_team_game_record IS NOT NULL')
+    rows = []
+    for (link, date, away, home) in cursor.fetchall():
+        game = codes.code(link)
+        rows.append((away, game, date_number(date), 0))
+        rows.append((home, game, date_number(date), 1))
+    cursor.executemany('INSERT INTO export_team_game VALUES (?, ?, ?, ?)', rows)
+
+def database_fingerprint(cursor):
+    ''' Changes whenever a game is read, read again or removed '''
+    # A game read again can get back the same row ids, its content hash
+    # and team record ids are checked too
+    digest = hashlib.sha1()
+    cursor.execute('SELECT link, content_hash, away_team_game_record,'
+                   ' home_team_game_record FROM boxscore'
+                   ' WHERE away_team_game_record IS NOT NULL ORDER BY rowid')
+    for row in cursor:
+        digest.update(repr(row))
+    cursor.execute('SELECT count(*), max(rowid) FROM player_game_record')
+    digest.update(repr(cursor.fetchone()))
+    return digest.hexdigest()
+
+def is_current(cursor, path):
+    ''' True if path has a finished export of the database as it is now '''
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except IOError:
+        return False
+    return manifest.get('database') == database_fingerprint(cursor)
+
+def export_player_games(cursor, path, chunk_size=10000):
+    ''' Write every player game record under path, returns the manifest
+        Columns are every player_game_record stat, plus keys;
+        game; code of the boxscore link
+        date; YYYYMMDD
+        home; 1 for the home team, 0 for away
+        team; code of the team name
+        player_link, fielding_pos; codes '''
+    if not os.path.isdir(path):
+        os.makedirs(path, 0755)
+    # Old manifest would describe files about to be overwritten
+    if os.path.isfile(os.path.join(path, MANIFEST)):
+        os.remove(os.path.join(path, MANIFEST))
+    fingerprint = database_fingerprint(cursor)
+    codes = dict((name, __Codes()) for name in ['game', 'team'] + CODED_COLUMNS)
+    __load_games(cursor, codes['game'])
+
+    columns = [__Column(path, name, 'i', INT32) for name in ['game', 'date']] + \
+              [__Column(path, 'home', 'b', INT8)] + \
+              [__Column(path, name, 'i', INT32) for name in ['team'] + CODED_COLUMNS] + \
+              [__Column(path, name, 'i', INT32, null=NULL_INT32) for name in STAT_COLUMNS]
+    query = 'SELECT g.game, g.date, g.home, t.team_name, %s FROM player_game_record AS p' \
+            ' JOIN export_team_game AS g ON g.team_id=p.game_record_id' \
+            ' JOIN team_game_record AS t ON t.id=p.game_record_id' \
+            ' ORDER BY p.rowid' % ','.join('p.%s' % c for c in CODED_COLUMNS + STAT_COLUMNS)
+    cursor.execute(query)
+    rows = 0
+    try:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for row in chunk:
+                for (count, column) in enumerate(columns):
+                    value = row[count]
+                    if column.name in codes and column.name != 'game':
+                        value = codes[column.name].code(value)
+                    column.append(value)
+            rows += len(chunk)
+            for column in columns:
+                column.flush()
+            log.debug('Exported %d rows' % rows)
+    finally:
+        for column in columns:
+            column.close()
+        cursor.execute('DROP TABLE export_team_game')
+
+    # Fingerprint of the database exported, see is_current
+    manifest = {'rows' : rows, 'columns' : dict(), 'database' : fingerprint}
+    for column in columns:
+        info = column.describe()
+        if column.name in codes:
+            info['values'] = codes[column.name].write(path, column.name)
+        manifest['columns'][column.name] = info
+    # Written last, a manifest means the export finished
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    return manifest
@@ -0,0 +1,89 @@
+import logging
+import Queue
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+
+log = logging.getLogger(__name__)
+
+# Ways to fetch pages
+# Threads uses a requests session shared by a pool of threads
+# Async uses tornado on a single event loop, see client.async_fetch
+ENGINE_THREADS = 'threads'
+ENGINE_ASYNC = 'async'
+ENGINES = [ENGINE_THREADS, ENGINE_ASYNC]
+
+# Sent with every request
+SESSION_HEADERS = {
+    'Accept-Encoding' : 'gzip, deflate',
+    'Connection' : 'keep-alive',
+}
+
+def create_session(pool_size=1, headers=None):
+    ''' Session shared for a whole run, so connections to the site are
+        kept alive and reused instead of opened for every page.
+        Pool should be at least as big as the number of workers, or
+        workers will throw away connections when the pool is full '''
+    session = requests.Session()
+    session.headers.update(SESSION_HEADERS)
+    if headers:
+        session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _fetch_worker(fetch, job_queue, result_queue):
+    while True:
+        job = job_queue.get()
+        # None is the signal to shut down
+        if job is None:
+            return
+        url, context = job
+        try:
+            result_queue.put((url, context, fetch(url), None))
+        except Exception as e:
+            result_queue.put((url, context, None, e))
+
+class ThreadedFetcher(object):
+    ''' Fetch pages on a bounded pool of worker threads.
+        Workers only do network i/o, every page is handed back to the
+        handler on the calling thread, so the handler is the only thing
+        that ever writes to disk or the database. '''
+
+    def __init__(self, fetch, workers=1):
+        self.fetch = fetch
+        self.workers = max(1, workers)
+
+    def run(self, jobs, handler):
+        ''' Jobs are (url, context) tuples
+            handler(url, context, text) is called once per page, in the
+            order they finish, and can return more jobs to fetch
+            Text is whatever fetch returned for the url '''
+        job_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+        pending = 0
+        for job in jobs:
+            job_queue.put(job)
+            pending += 1
+        threads = []
+        for _ in range(self.workers):
+            t = threading.Thread(target=_fetch_worker,
+                                 args=(self.fetch, job_queue, result_queue))
+            t.daemon = True
+            t.start()
+            threads.append(t)
+        try:
+            while pending:
+                url, context, text, error = result_queue.get()
+                pending -= 1
+                if error is not None:
+                    log.error('Error fetching url:%s, %s' % (url, error))
+                    raise error
+                for job in handler(url, context, text) or []:
+                    job_queue.put(job)
+                    pending += 1
+        finally:
+            for _ in threads:
+                job_queue.put(None)
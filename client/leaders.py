@@ -0,0 +1,185 @@
+''' Rate stats and leaderboards from column files, see client.export
+    Every player is added up at once with numpy, rows are never looped
+    over in python '''
+from collections import namedtuple
+import json
+import os
+
+import numpy
+
+from client import export
+
+# Innings pitched as outs, 6.2 innings is 6 whole and 2 outs
+OUTS_PITCHED = 'outs_pitched'
+
+# Players must reach a minimum of one of these to be on a leaderboard
+QUALIFY_PA = 'plate_appearances'
+QUALIFY_IP = 'innings_pitched'
+
+Stat = namedtuple('Stat', ['columns', 'compute', 'qualifier', 'ascending'])
+
+def __divide(top, bottom):
+    # Nan where there is nothing to divide by
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return numpy.where(bottom > 0, top / bottom, numpy.nan)
+
+def __innings(s):
+    return s[OUTS_PITCHED] / 3.0
+
+def __total_bases(s):
+    return s['hits'] + s['doubles'] + 2 * s['triples'] + 3 * s['home_runs']
+
+def __on_base(s):
+    return s['hits'] + s['bases_on_balls'] + s['hit_by_pitch']
+
+# Sacrifice flies are not saved, so on base percentage leaves them out
+RATE_STATS = {
+    'avg' : Stat(['hits', 'at_bats'],
+                 lambda s: __divide(s['hits'], s['at_bats']),
+                 QUALIFY_PA, False),
+    'obp' : Stat(['hits', 'bases_on_balls', 'hit_by_pitch', 'at_bats'],
+                 lambda s: __divide(__on_base(s),
+                                    s['at_bats'] + s['bases_on_balls'] + s['hit_by_pitch']),
+                 QUALIFY_PA, False),
+    'slg' : Stat(['hits', 'doubles', 'triples', 'home_runs', 'at_bats'],
+                 lambda s: __divide(__total_bases(s), s['at_bats']),
+                 QUALIFY_PA, False),
+    'ops' : Stat(['hits', 'doubles', 'triples', 'home_runs', 'bases_on_balls',
+                  'hit_by_pitch', 'at_bats'],
+                 lambda s: __divide(__on_base(s),
+                                    s['at_bats'] + s['bases_on_balls'] + s['hit_by_pitch']) + \
+                           __divide(__total_bases(s), s['at_bats']),
+                 QUALIFY_PA, False),
+    'era' : Stat(['earned_runs_allowed', OUTS_PITCHED],
+                 lambda s: __divide(9 * s['earned_runs_allowed'], __innings(s)),
+                 QUALIFY_IP, True),
+    'whip' : Stat(['bases_on_balls_allowed', 'hits_allowed', OUTS_PITCHED],
+                  lambda s: __divide(s['bases_on_balls_allowed'] + s['hits_allowed'],
+                                     __innings(s)),
+                  QUALIFY_IP, True),
+    'k9' : Stat(['pitching_strike_outs', OUTS_PITCHED],
+                lambda s: __divide(9 * s['pitching_strike_outs'], __innings(s)),
+                QUALIFY_IP, False),
+    'bb9' : Stat(['bases_on_balls_allowed', OUTS_PITCHED],
+                 lambda s: __divide(9 * s['bases_on_balls_allowed'], __innings(s)),
+                 QUALIFY_IP, True),
+    'hr9' : Stat(['home_runs_allowed', OUTS_PITCHED],
+                 lambda s: __divide(9 * s['home_runs_allowed'], __innings(s)),
+                 QUALIFY_IP, True),
+}
+
+# Any stat column can be a leaderboard too, as a season total
+STATS = sorted(RATE_STATS.keys()) + sorted(export.STAT_COLUMNS + [OUTS_PITCHED])
+
+Leader = namedtuple('Leader', ['player_link', 'value', 'games',
+                               'plate_appearances', 'innings_pitched'])
+
+class Lines(object):
+    ''' Column files written by client.export, memory mapped
+        Files are only opened when a column is first used '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, export.MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.rows = self.manifest['rows']
+        self.__columns = dict()
+        self.__values = dict()
+
+    def column(self, name):
+        ''' Column as saved, NULL is the null value in the manifest '''
+        try:
+            return self.__columns[name]
+        except KeyError:
+            info = self.manifest['columns'][name]
+            if self.rows:
+                column = numpy.memmap(os.path.join(self.path, info['file']),
+                                      dtype=str(info['dtype']), mode='r',
+                                      shape=(self.rows,))
+            else:
+                column = numpy.zeros(0, dtype=str(info['dtype']))
+            self.__columns[name] = column
+            return column
+
+    def stat(self, name):
+        ''' Stat column with NULL as 0 '''
+        if name == OUTS_PITCHED:
+            return self.stat('innings_pitched_whole') * 3 + \
+                   self.stat('innings_pitched_part')
+        column = self.column(name)
+        return numpy.where(column == self.manifest['columns'][name]['null'], 0, column)
+
+    def values(self, name):
+        ''' Text for each code of a coded column '''
+        try:
+            return self.__values[name]
+        except KeyError:
+            file_name = os.path.join(self.path, self.manifest['columns'][name]['values'])
+            with open(file_name) as f:
+                values = [line.rstrip('\n').decode('utf-8') for line in f]
+            self.__values[name] = values
+            return values
+
+    def codes(self, name, values):
+        ''' Codes of values in a coded column, values never seen are left out '''
+        wanted = set(values)
+        return [code for (code, value) in enumerate(self.values(name)) if value in wanted]
+
+def select(lines, start=None, end=None, teams=None):
+    ''' Rows played from start to end, both YYYYMMDD and included,
+        by any of teams, every row for any left as None '''
+    mask = numpy.ones(lines.rows, dtype=bool)
+    if start is not None:
+        mask &= lines.column('date') >= start
+    if end is not None:
+        mask &= lines.column('date') <= end
+    if teams:
+        mask &= numpy.in1d(lines.column('team'), lines.codes('team', teams))
+    return mask
+
+def totals(lines, columns, mask):
+    ''' Sum of each column for every player in rows of mask, arrays
+        are indexed by player code, games is the number of rows '''
+    players = lines.column('player_link')[mask]
+    size = len(lines.values('player_link'))
+    sums = {'games' : numpy.bincount(players, minlength=size)}
+    for name in set(columns):
+        sums[name] = numpy.bincount(players, weights=lines.stat(name)[mask],
+                                    minlength=size)
+    return sums
+
+def player_stats(lines, stats, mask):
+    ''' Totals needed by stats plus the value of each stat, by player code '''
+    columns = [QUALIFY_PA, OUTS_PITCHED]
+    for name in stats:
+        columns += RATE_STATS[name].columns if name in RATE_STATS else [name]
+    sums = totals(lines, columns, mask)
+    sums[QUALIFY_IP] = __innings(sums)
+    for name in stats:
+        if name in RATE_STATS:
+            sums[name] = RATE_STATS[name].compute(sums)
+    return sums
+
+def leaderboard(lines, stat, start=None, end=None, teams=None,
+                min_pa=0, min_ip=0, limit=10):
+    ''' Best players for stat, as a list of Leader
+        Rate stats only include players with at least min_pa plate
+        appearances or min_ip innings pitched, whichever the stat uses '''
+    sums = player_stats(lines, [stat], select(lines, start=start, end=end, teams=teams))
+    values = sums[stat]
+    keep = (sums['games'] > 0) & ~numpy.isnan(values)
+    ascending = False
+    if stat in RATE_STATS:
+        ascending = RATE_STATS[stat].ascending
+        if RATE_STATS[stat].qualifier == QUALIFY_PA:
+            keep &= sums[QUALIFY_PA] >= min_pa
+        else:
+            keep &= sums[QUALIFY_IP] >= min_ip
+    players = numpy.flatnonzero(keep)
+    order = numpy.argsort(values[players], kind='mergesort')
+    if not ascending:
+        order = order[::-1]
+    links = lines.values('player_link')
+    return [Leader(links[code], float(values[code]), int(sums['games'][code]),
+                   int(sums[QUALIFY_PA][code]), float(sums[QUALIFY_IP][code]))
+            for code in players[order[:limit]]]
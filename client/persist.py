@@ -0,0 +1,139 @@
+from collections import OrderedDict
+
+from client import records
+from client import seasons
+from client import store
+
+PERSON_COLUMNS = ['first_name', 'last_name', 'link']
+
+# Most links remembered per table, far more players than have ever played
+KNOWN_MAX_SIZE = 100000
+
+class KnownLinks(object):
+    ''' Links already saved to a table, so they are never inserted again
+        Least recently seen links are dropped once past max_size '''
+
+    def __init__(self, table, max_size=KNOWN_MAX_SIZE):
+        self.table = table
+        self.max_size = max_size
+        self.links = OrderedDict()
+
+    def preload(self, cursor):
+        ''' Forget everything, then load links already in the database '''
+        self.links = OrderedDict()
+        for link in store.links(cursor, self.table, self.max_size):
+            self.links[link] = True
+
+    def seen(self, link):
+        try:
+            # Move to the end, most recently seen
+            self.links[link] = self.links.pop(link)
+            return True
+        except KeyError:
+            return False
+
+    def add(self, link):
+        self.links[link] = True
+        if len(self.links) > self.max_size:
+            self.links.popitem(last=False)
+
+# Shared by every game saved in this process
+known_players = KnownLinks('player')
+known_managers = KnownLinks('manager')
+
+def preload_known(cursor):
+    ''' Load known players and managers for the database cursor is on
+        Call before saving games to a database '''
+    known_players.preload(cursor)
+    known_managers.preload(cursor)
+
+def __save_team(cursor, team):
+    # Id is needed by the rest of the rows, so this is the one single insert
+    return store.insert(cursor, 'team_game_record',
+                        team.values(records.TEAM_LINE_COLUMNS),
+                        columns=records.TEAM_LINE_COLUMNS)
+
+def save_game(cursor, game):
+    ''' Write a game read by read_score in one pass
+        Each table gets one batched insert for the whole game
+        Boxscore row for game.link must already exist
+        A game saved before is replaced, callers keep that atomic by
+        saving each game in its own transaction or savepoint
+        Returns the away and home team_game_record ids '''
+    state = store.parse_state(cursor, game.link)
+    if state is not None and (state[2] is not None or state[3] is not None):
+        # Page read before, replace everything saved from it
+        old = load_game(cursor, game.link)
+        if old is not None:
+            seasons.add_game(cursor, old, sign=-1)
+        store.delete_game(cursor, game.link, state[2:])
+    # Only players and managers not known yet are inserted
+    # Still ignore existing ones, links past the cache size are forgotten
+    new_managers = [p for p in game.managers.values() \
+                    if not known_managers.seen(p.link)]
+    new_players = [p for p in game.players.values() \
+                   if not known_players.seen(p.link)]
+    store.insert_many(cursor, 'manager',
+                      [p.values(PERSON_COLUMNS) for p in new_managers],
+                      columns=PERSON_COLUMNS, ignore=True)
+    store.insert_many(cursor, 'player',
+                      [p.values(PERSON_COLUMNS) for p in new_players],
+                      columns=PERSON_COLUMNS, ignore=True)
+    away = __save_team(cursor, game.away)
+    home = __save_team(cursor, game.home)
+
+    innings = []
+    lines = []
+    for (record_id, team) in [(away, game.away), (home, game.home)]:
+        for (count, score) in enumerate(team.innings):
+            innings.append((record_id, count + 1, score))
+        for line in team.players.values():
+            lines.append([record_id] + line.values(records.PLAYER_LINE_COLUMNS))
+    store.insert_many(cursor, 'inning_score', innings,
+                      columns=['game_record_id', 'inning', 'score'])
+    store.insert_many(cursor, 'player_game_record', lines,
+                      columns=['game_record_id'] + records.PLAYER_LINE_COLUMNS)
+    store.insert_many(cursor, 'umpire_game_record',
+                      [(u.name, u.position, game.link) for u in game.umpires],
+                      columns=['name', 'position', 'boxscore_link'])
+
+    store.update(cursor, 'boxscore',
+                 game.values(records.GAME_COLUMNS) + [away, home],
+                 records.GAME_COLUMNS + ['away_team_game_record',
+                                         'home_team_game_record'],
+                 'link', game.link)
+    seasons.add_game(cursor, game)
+    # Only known once the whole game saved, a failed game is rolled back
+    for person in new_managers:
+        known_managers.add(person.link)
+    for person in new_players:
+        known_players.add(person.link)
+    return away, home
+
+def __load_team(cursor, record_id):
+    team = records.TeamLine(**dict(zip(
+        records.TEAM_LINE_COLUMNS,
+        store.select_one(cursor, 'team_game_record', records.TEAM_LINE_COLUMNS,
+                         'id', record_id) or [])))
+    for row in store.select_all(cursor, 'inning_score', ['score'],
+                                'game_record_id', record_id, order='inning'):
+        team.innings.append(row[0])
+    for row in store.select_all(cursor, 'player_game_record',
+                                records.PLAYER_LINE_COLUMNS,
+                                'game_record_id', record_id):
+        line = records.PlayerLine(**dict(zip(records.PLAYER_LINE_COLUMNS, row)))
+        team.players[line.player_link] = line
+    return team
+
+def load_game(cursor, link):
+    ''' Game saved for a boxscore, None if it was never read
+        Players, managers and umpires are not loaded '''
+    columns = records.GAME_COLUMNS + ['away_team_game_record',
+                                      'home_team_game_record']
+    row = store.select_one(cursor, 'boxscore', columns, 'link', link)
+    if row is None or row[-2] is None:
+        return None
+    game = records.Game(link=link, **dict(zip(records.GAME_COLUMNS, row)))
+    game.away = __load_team(cursor, row[-2])
+    game.home = __load_team(cursor, row[-1])
+    return game
@@ -0,0 +1,87 @@
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Responses that mean try again later
+RETRY_STATUS = [429, 500, 502, 503, 504]
+# Responses that mean slow down
+THROTTLE_STATUS = [429, 503]
+
+DEFAULT_RETRIES = 5
+# Seconds to wait after first failure, doubles every retry
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 120.0
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    ''' Exponential backoff with jitter, attempt starts at 0
+        Jitter keeps workers from all retrying at the same time '''
+    delay = min(cap, base * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+def retry_after(headers):
+    # Retry-After is usually seconds, ignore the http date form
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter(object):
+    ''' Token bucket shared by every worker
+        Rate is in requests per second. It goes up a little on every
+        good response and gets cut in half when the site throttles or
+        errors, so it settles near the fastest rate the site allows '''
+
+    def __init__(self, rate=5.0, min_rate=0.2, max_rate=50.0,
+                 increase=0.1, decrease=0.5, burst=1, cooldown=2.0):
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        # Requests already in flight will fail together, only slow
+        # down once for all of them
+        self.cooldown = cooldown
+        self.last_throttle = 0
+        self.tokens = float(burst)
+        self.last = time.time()
+        # Nothing gets sent before this, set by Retry-After
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        ''' Take a token, returns seconds caller must wait before sending
+            Tokens can go negative, so callers queue up in order '''
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            wait = 0
+            if self.tokens < 0:
+                wait = -self.tokens / self.rate
+            return max(wait, self.paused_until - now)
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def throttled(self, pause=None):
+        with self.lock:
+            now = time.time()
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+            if now - self.last_throttle < self.cooldown:
+                return
+            self.last_throttle = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            log.warning('Throttled, rate now %.2f requests/second' % self.rate)
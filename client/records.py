@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+from client import store
+
+# Columns each record writes, ids and links to other tables are set
+# when the game is saved
+PLAYER_LINE_COLUMNS = [c for c in store.table_columns('player_game_record') \
+                       if c != 'game_record_id']
+TEAM_LINE_COLUMNS = [c for c in store.table_columns('team_game_record') \
+                     if c != 'id']
+GAME_COLUMNS = ['date', 'attendance', 'game_time', 'field_used',
+                'winning_pitcher', 'losing_pitcher', 'saving_pitcher',
+                'weather_description', 'parse_version', 'content_hash']
+
+class Record(object):
+    ''' Values kept in slots instead of a dict per object
+        Every slot starts as None unless given '''
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    def values(self, columns):
+        return [getattr(self, name) for name in columns]
+
+    # Slots have no __dict__, so pickle (used by multiprocessing)
+    # needs these
+    def __getstate__(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+    def __setstate__(self, state):
+        for (name, value) in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+class Person(Record):
+    ''' Player or manager '''
+    __slots__ = ('first_name', 'last_name', 'link')
+
+class Umpire(Record):
+    __slots__ = ('name', 'position')
+
+class PlayerLine(Record):
+    ''' One player_game_record row '''
+    __slots__ = tuple(PLAYER_LINE_COLUMNS)
+
+class TeamLine(Record):
+    ''' One team_game_record row, with its innings and player lines '''
+    __slots__ = tuple(TEAM_LINE_COLUMNS) + ('innings', 'players')
+
+    def __init__(self, **kwargs):
+        super(TeamLine, self).__init__(**kwargs)
+        # Runs scored each inning, in order
+        self.innings = []
+        # Player link -> PlayerLine, in the order players were found
+        self.players = OrderedDict()
+
+    def player_line(self, player_link):
+        ''' Line for player, made on first use '''
+        try:
+            return self.players[player_link]
+        except KeyError:
+            line = PlayerLine(player_link=player_link)
+            self.players[player_link] = line
+            return line
+
+class Game(Record):
+    ''' Everything read from one boxscore page '''
+    __slots__ = ('link',) + tuple(GAME_COLUMNS) + \
+                ('away', 'home', 'umpires', 'players', 'managers')
+
+    def __init__(self, **kwargs):
+        super(Game, self).__init__(**kwargs)
+        self.umpires = []
+        # Link -> Person, first name seen on the page is kept
+        self.players = OrderedDict()
+        self.managers = OrderedDict()
+
+    def add_player(self, person):
+        self.players.setdefault(person.link, person)
+
+    def add_manager(self, person):
+        self.managers.setdefault(person.link, person)
@@ -0,0 +1,99 @@
+''' Season totals for players and teams, kept up to date as each game
+    is saved so leaderboards never add up every game '''
+import logging
+
+from client import store
+
+log = logging.getLogger(__name__)
+
+# Summed straight from player lines, innings pitched is summed as outs
+PLAYER_SEASON_STATS = [c for c in store.table_columns('player_season_record') \
+                       if c not in ['player_link', 'year', 'games', 'outs_pitched']]
+PLAYER_SEASON_KEYS = ['player_link', 'year']
+PLAYER_SEASON_COLUMNS = ['games'] + PLAYER_SEASON_STATS + ['outs_pitched']
+
+TEAM_SEASON_KEYS = ['team_name', 'year']
+TEAM_SEASON_COLUMNS = ['games', 'wins', 'losses', 'runs_scored',
+                       'runs_allowed', 'hits', 'errors', 'left_on_base']
+
+# Every team record in a game, with the other team and year played
+# Date format is [Year]-[Month]-[Day] [Time]
+GAME_TEAMS = '''
+    SELECT away_team_game_record AS team_id, home_team_game_record AS other_id,
+           CAST(substr(date, 1, 4) AS INTEGER) AS year
+    FROM boxscore WHERE away_team_game_record IS NOT NULL
+    UNION ALL
+    SELECT home_team_game_record, away_team_game_record,
+           CAST(substr(date, 1, 4) AS INTEGER)
+    FROM boxscore WHERE home_team_game_record IS NOT NULL'''
+
+def season_year(date):
+    return int(date.split('-')[0])
+
+def __outs(line):
+    # Partial innings are written as tenths, 6.2 is 6 innings and 2 outs
+    return (line.innings_pitched_whole or 0) * 3 + \
+           (line.innings_pitched_part or 0)
+
+def __won(team, other):
+    return int(team.score is not None and other.score is not None and \
+               team.score > other.score)
+
+def add_game(cursor, game, sign=1):
+    ''' Add a game to season totals, sign of -1 takes it back out '''
+    year = season_year(game.date)
+    players = []
+    teams = []
+    for (team, other) in [(game.away, game.home), (game.home, game.away)]:
+        for line in team.players.values():
+            players.append([sign] + \
+                           [sign * (getattr(line, c) or 0) for c in PLAYER_SEASON_STATS] + \
+                           [sign * __outs(line), line.player_link, year])
+        teams.append([sign, sign * __won(team, other), sign * __won(other, team),
+                      sign * (team.score or 0), sign * (other.score or 0),
+                      sign * (team.hits or 0), sign * (team.errors or 0),
+                      sign * (team.left_on_base or 0), team.team_name, year])
+    # Season rows start at zero the first time a player or team is seen
+    store.insert_many(cursor, 'player_season_record',
+                      [row[-2:] for row in players],
+                      columns=PLAYER_SEASON_KEYS, ignore=True)
+    store.insert_many(cursor, 'team_season_record', [row[-2:] for row in teams],
+                      columns=TEAM_SEASON_KEYS, ignore=True)
+    store.increment_many(cursor, 'player_season_record', players,
+                         PLAYER_SEASON_COLUMNS, PLAYER_SEASON_KEYS)
+    store.increment_many(cursor, 'team_season_record', teams,
+                         TEAM_SEASON_COLUMNS, TEAM_SEASON_KEYS)
+    if sign < 0:
+        # Seasons of this game with no games left, found by their keys so
+        # taking a game out never scans every season
+        store.delete_empty_many(cursor, 'player_season_record',
+                                [row[-2:] for row in players], PLAYER_SEASON_KEYS)
+        store.delete_empty_many(cursor, 'team_season_record',
+                                [row[-2:] for row in teams], TEAM_SEASON_KEYS)
+
+def rebuild(cursor):
+    ''' Add up every season again from all games saved '''
+    log.info('Rebuilding season totals')
+    cursor.execute('DELETE FROM player_season_record')
+    cursor.execute('DELETE FROM team_season_record')
+    sums = ','.join('COALESCE(SUM(p.%s), 0)' % c for c in PLAYER_SEASON_STATS)
+    cursor.execute('INSERT INTO player_season_record(%s) '
+                   'SELECT p.player_link, g.year, COUNT(*), %s, '
+                   'COALESCE(SUM(COALESCE(p.innings_pitched_whole, 0) * 3 + '
+                   'COALESCE(p.innings_pitched_part, 0)), 0) '
+                   'FROM (%s) AS g '
+                   'JOIN player_game_record AS p ON p.game_record_id=g.team_id '
+                   'GROUP BY p.player_link, g.year' % \
+                   (','.join(PLAYER_SEASON_KEYS + PLAYER_SEASON_COLUMNS),
+                    sums, GAME_TEAMS))
+    cursor.execute('INSERT INTO team_season_record(%s) '
+                   'SELECT t.team_name, g.year, COUNT(*), '
+                   'SUM(t.score > o.score), SUM(t.score < o.score), '
+                   'COALESCE(SUM(t.score), 0), COALESCE(SUM(o.score), 0), '
+                   'COALESCE(SUM(t.hits), 0), COALESCE(SUM(t.errors), 0), '
+                   'COALESCE(SUM(t.left_on_base), 0) '
+                   'FROM (%s) AS g '
+                   'JOIN team_game_record AS t ON t.id=g.team_id '
+                   'JOIN team_game_record AS o ON o.id=g.other_id '
+                   'GROUP BY t.team_name, g.year' % \
+                   (','.join(TEAM_SEASON_KEYS + TEAM_SEASON_COLUMNS), GAME_TEAMS))
@@ -0,0 +1,40 @@
+import logging
+
+from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+
+log = logging.getLogger(__name__)
+
+# Parsers BeautifulSoup can build a tree with
+# lxml is much faster, html.parser always exists
+PARSER_LXML = 'lxml'
+PARSER_HTML = 'html.parser'
+PARSER_HTML5LIB = 'html5lib'
+PARSERS = [PARSER_LXML, PARSER_HTML, PARSER_HTML5LIB]
+
+# Same pick BeautifulSoup makes with no parser given, but explicit so
+# every entry point builds the same tree
+try:
+    import lxml
+    DEFAULT_PARSER = PARSER_LXML
+except ImportError:
+    DEFAULT_PARSER = PARSER_HTML
+# Warn the first time pages are read without lxml
+__warn_default = DEFAULT_PARSER != PARSER_LXML
+
+# Only the parts of a page that are read, everything else is skipped
+# while parsing so it never becomes part of the tree
+BOXSCORE_CONTENT = SoupStrainer('div', id='page_content')
+YEAR_CONTENT = SoupStrainer(id='page_content')
+SCHEDULE_LINKS = SoupStrainer('a', href=True)
+
+def make_soup(text, parser=None, only=None):
+    ''' Build a tree from text with parser, or the default parser
+        Only is a SoupStrainer, to build just part of the page '''
+    global __warn_default
+    parser = parser or DEFAULT_PARSER
+    if __warn_default and parser == DEFAULT_PARSER:
+        __warn_default = False
+        log.warning('lxml is not installed, reading pages with the much '
+                    'slower %s' % DEFAULT_PARSER)
+    return BeautifulSoup(text, parser, parse_only=only)
@@ -0,0 +1,209 @@
+''' Every statement run against the database
+    Statements use ? parameters, so the text of each one never changes
+    and sqlite compiles it once and reuses it from the statement cache '''
+from client import utils
+
+def table_columns(table_name):
+    for table in utils.DATABASE_SCHEMA['tables']:
+        if table['name'] == table_name:
+            return [column.split(' ')[0] for column in table['columns']]
+    raise KeyError(table_name)
+
+def __placeholders(columns):
+    return ','.join('?' for _ in columns)
+
+def __all_inserts(verb):
+    statements = dict()
+    for table in utils.DATABASE_SCHEMA['tables']:
+        columns = table_columns(table['name'])
+        statements[table['name']] = '%s INTO %s(%s) VALUES (%s)' % \
+            (verb, table['name'], ','.join(columns), __placeholders(columns))
+    return statements
+
+# Insert statements for every column of every table
+INSERT = __all_inserts('INSERT')
+INSERT_OR_IGNORE = __all_inserts('INSERT OR IGNORE')
+
+# Statements for only some columns, built on first use
+__statements = dict()
+
+def insert_statement(table, columns=None, ignore=False):
+    ''' Insert for columns of table, every column if None
+        With ignore, rows that already exist are skipped '''
+    if columns is None:
+        return (INSERT_OR_IGNORE if ignore else INSERT)[table]
+    key = ('insert', table, tuple(columns), ignore)
+    try:
+        return __statements[key]
+    except KeyError:
+        verb = 'INSERT OR IGNORE' if ignore else 'INSERT'
+        statement = '%s INTO %s(%s) VALUES (%s)' % \
+                    (verb, table, ','.join(columns), __placeholders(columns))
+        __statements[key] = statement
+        return statement
+
+def update_statement(table, columns, where):
+    ''' Update columns of table, for rows where column "where" matches '''
+    key = ('update', table, tuple(columns), where)
+    try:
+        return __statements[key]
+    except KeyError:
+        statement = 'UPDATE %s SET %s WHERE %s=?' % \
+                    (table, ','.join('%s=?' % c for c in columns), where)
+        __statements[key] = statement
+        return statement
+
+def increment_statement(table, columns, keys):
+    ''' Add to columns of table, for rows where every key column matches '''
+    key = ('increment', table, tuple(columns), tuple(keys))
+    try:
+        return __statements[key]
+    except KeyError:
+        statement = 'UPDATE %s SET %s WHERE %s' % \
+                    (table, ','.join('%s=%s+?' % (c, c) for c in columns),
+                     ' AND '.join('%s=?' % k for k in keys))
+        __statements[key] = statement
+        return statement
+
+def delete_empty_statement(table, keys):
+    ''' Delete the row of table where every key column matches, if it has
+        no games left '''
+    key = ('delete_empty', table, tuple(keys))
+    try:
+        return __statements[key]
+    except KeyError:
+        statement = 'DELETE FROM %s WHERE %s AND games<=0' % \
+                    (table, ' AND '.join('%s=?' % k for k in keys))
+        __statements[key] = statement
+        return statement
+
+def select_statement(table, columns, where, order=None):
+    key = ('select', table, tuple(columns), where, order)
+    try:
+        return __statements[key]
+    except KeyError:
+        statement = 'SELECT %s FROM %s WHERE %s=?' % (','.join(columns), table, where)
+        if order:
+            statement += ' ORDER BY %s' % order
+        __statements[key] = statement
+        return statement
+
+def select_one(cursor, table, columns, where, key):
+    ''' First row where column "where" matches key, None if no rows '''
+    cursor.execute(select_statement(table, columns, where), (key,))
+    return cursor.fetchone()
+
+def select_all(cursor, table, columns, where, key, order=None):
+    cursor.execute(select_statement(table, columns, where, order=order), (key,))
+    return cursor.fetchall()
+
+def insert(cursor, table, values, columns=None, ignore=False):
+    ''' Returns rowid of the new row '''
+    cursor.execute(insert_statement(table, columns=columns, ignore=ignore), values)
+    return cursor.lastrowid
+
+def insert_many(cursor, table, rows, columns=None, ignore=False):
+    if rows:
+        cursor.executemany(insert_statement(table, columns=columns, ignore=ignore),
+                           rows)
+
+def update(cursor, table, values, columns, where, key):
+    cursor.execute(update_statement(table, columns, where), list(values) + [key])
+
+def update_many(cursor, table, rows, columns, where):
+    ''' Each row is the values for columns, then the key to match '''
+    if rows:
+        cursor.executemany(update_statement(table, columns, where), rows)
+
+def increment_many(cursor, table, rows, columns, keys):
+    ''' Each row is the amounts to add to columns, then the key values '''
+    if rows:
+        cursor.executemany(increment_statement(table, columns, keys), rows)
+
+def delete_empty_many(cursor, table, rows, keys):
+    ''' Each row is the key values of a row to delete if it has no games '''
+    if rows:
+        cursor.executemany(delete_empty_statement(table, keys), rows)
+
+def __year_pattern(year):
+    # Date has numeric affinity, so compare the text of the year
+    return '%d-%%' % year
+
+# boxscore_meta
+
+def add_schedule(cursor, year, team_name, schedule_link):
+    insert(cursor, 'boxscore_meta', [year, team_name, schedule_link],
+           columns=['year', 'team_name', 'schedule_link'])
+
+def teams_gathered(cursor, year):
+    cursor.execute('SELECT count(*) FROM boxscore_meta WHERE year=?', (year,))
+    return cursor.fetchone()[0] > 0
+
+def schedules(cursor, year):
+    ''' Tuples of (year, team_name, schedule_link, links_collected) '''
+    cursor.execute('SELECT year, team_name, schedule_link, links_collected'
+                   ' FROM boxscore_meta WHERE year=?', (year,))
+    return cursor.fetchall()
+
+def mark_links_collected(cursor, schedule_links):
+    update_many(cursor, 'boxscore_meta',
+                [(1, link) for link in schedule_links],
+                ['links_collected'], 'schedule_link')
+
+# boxscore
+
+def year_boxscores(cursor, year):
+    ''' Tuples of (link, team_one_name, team_two_name) '''
+    cursor.execute('SELECT link, team_one_name, team_two_name FROM boxscore'
+                   ' WHERE date LIKE ?', (__year_pattern(year),))
+    return cursor.fetchall()
+
+def saved_boxscores(cursor, year):
+    ''' Tuples of (link, html_path) for boxscores saved in year '''
+    cursor.execute('SELECT link, html_path FROM boxscore'
+                   ' WHERE download_state=? AND date LIKE ?',
+                   (utils.DOWNLOAD_SAVED, __year_pattern(year)))
+    return cursor.fetchall()
+
+def parsed_links(cursor, year):
+    cursor.execute('SELECT link FROM boxscore'
+                   ' WHERE away_team_game_record IS NOT NULL AND date LIKE ?',
+                   (__year_pattern(year),))
+    return set(row[0] for row in cursor.fetchall())
+
+def unparsed_paths(cursor):
+    cursor.execute('SELECT html_path FROM boxscore WHERE html_path IS NOT NULL'
+                   ' AND away_team_game_record IS NULL')
+    return [row[0] for row in cursor.fetchall()]
+
+def parse_state(cursor, link):
+    ''' Tuple of (parse_version, content_hash, away_team_game_record,
+        home_team_game_record), None if there is no boxscore '''
+    cursor.execute('SELECT parse_version, content_hash, away_team_game_record,'
+                   ' home_team_game_record FROM boxscore WHERE link=?', (link,))
+    return cursor.fetchone()
+
+def delete_game(cursor, link, record_ids):
+    ''' Delete everything read from a boxscore page
+        Players and managers are shared by games, so they stay '''
+    rows = [(record_id,) for record_id in record_ids if record_id is not None]
+    for table in ['player_game_record', 'inning_score']:
+        cursor.executemany('DELETE FROM %s WHERE game_record_id=?' % table, rows)
+    cursor.executemany('DELETE FROM team_game_record WHERE id=?', rows)
+    cursor.execute('DELETE FROM umpire_game_record WHERE boxscore_link=?', (link,))
+
+def link_for_path(cursor, html_path):
+    cursor.execute('SELECT link FROM boxscore WHERE html_path=?', (html_path,))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+def has_boxscore(cursor, link):
+    cursor.execute('SELECT 1 FROM boxscore WHERE link=?', (link,))
+    return cursor.fetchone() is not None
+
+# player and manager
+
+def links(cursor, table, limit):
+    ''' Up to limit links from the player or manager table '''
+    cursor.execute('SELECT link FROM %s LIMIT ?' % table, (limit,))
+    return (row[0] for row in cursor)
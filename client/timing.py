@@ -0,0 +1,148 @@
+''' Wall time and call counts for each stage of reading boxscores, and
+    for each kind of SQL statement
+    Off unless enabled, stages then cost one check each '''
+from collections import defaultdict
+from contextlib import contextmanager
+import re
+import time
+
+# Statement kind is the verb and the table, such as "INSERT player"
+SQL_TABLE = re.compile(r'\b(?:INTO|FROM|UPDATE|TABLE|INDEX)\s+(\w+)', re.IGNORECASE)
+
+class Timings(object):
+    ''' Seconds, calls and rows for each name, added up across files
+        Rows are the parameter sets a statement ran with '''
+
+    def __init__(self):
+        self.stages = defaultdict(lambda: [0.0, 0])
+        self.sql = defaultdict(lambda: [0.0, 0, 0])
+
+    def add_stage(self, name, seconds):
+        total = self.stages[name]
+        total[0] += seconds
+        total[1] += 1
+
+    def add_sql(self, kind, seconds, rows=0, calls=1):
+        total = self.sql[kind]
+        total[0] += seconds
+        total[1] += calls
+        total[2] += rows
+
+    def merge(self, report):
+        ''' Add a report from another process, such as a parsing worker '''
+        for (name, total) in report['stages'].items():
+            self.stages[name][0] += total['seconds']
+            self.stages[name][1] += total['calls']
+        for (kind, total) in report['sql'].items():
+            self.add_sql(kind, total['seconds'], rows=total['rows'],
+                         calls=total['calls'])
+
+    def report(self):
+        ''' Everything recorded, as a dict ready for json '''
+        return {
+            'stages' : dict((name, {'seconds' : t[0], 'calls' : t[1]})
+                            for (name, t) in self.stages.items()),
+            'sql' : dict((kind, {'seconds' : t[0], 'calls' : t[1], 'rows' : t[2]})
+                         for (kind, t) in self.sql.items()),
+        }
+
+# Timings being recorded, None when profiling is off
+timings = None
+
+def enable():
+    ''' Start recording with new timings, returns them '''
+    global timings
+    timings = Timings()
+    return timings
+
+def disable():
+    ''' Stop recording, returns the timings recorded '''
+    global timings
+    recorded, timings = timings, None
+    return recorded
+
+@contextmanager
+def stage(name):
+    ''' Time everything run in the with block as stage name '''
+    if timings is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings.add_stage(name, time.time() - start)
+
+# Statement text -> kind, statements are the same text every time
+__kinds = dict()
+
+def statement_kind(statement):
+    try:
+        return __kinds[statement]
+    except KeyError:
+        words = statement.split()
+        verb = words[0].upper() if words else ''
+        table = SQL_TABLE.search(statement)
+        kind = '%s %s' % (verb, table.group(1)) if table else verb
+        __kinds[statement] = kind
+        return kind
+
+class TimedCursor(object):
+    ''' Cursor that adds the time of every statement to timings
+        Fetching rows counts towards the statement that found them '''
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.kind = None
+
+    def __time(self, kind, call, rows=0):
+        start = time.time()
+        try:
+            return call()
+        finally:
+            if timings is not None:
+                timings.add_sql(kind, time.time() - start, rows=rows)
+
+    def execute(self, statement, parameters=()):
+        self.kind = statement_kind(statement)
+        self.__time(self.kind, lambda: self.cursor.execute(statement, parameters),
+                    rows=1)
+        return self
+
+    def executemany(self, statement, rows):
+        self.kind = statement_kind(statement)
+        rows = list(rows)
+        self.__time(self.kind, lambda: self.cursor.executemany(statement, rows),
+                    rows=len(rows))
+        return self
+
+    def __fetch(self, call):
+        start = time.time()
+        result = call()
+        if timings is not None:
+            timings.add_sql(self.kind, time.time() - start, calls=0)
+        return result
+
+    def fetchone(self):
+        return self.__fetch(self.cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self.__fetch(self.cursor.fetchmany)
+        return self.__fetch(lambda: self.cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self.__fetch(self.cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        # lastrowid, connection, everything else is the real cursor's
+        return getattr(self.cursor, name)
+
+def cursor(cursor):
+    ''' Timed cursor while profiling, cursor itself otherwise '''
+    if timings is None:
+        return cursor
+    return TimedCursor(cursor)
@@ -101,7 +101,8 @@ DATABASE_SCHEMA = {
             "columns": [
                 "team_name VARCHAR(125)",
                 "year INTEGER",
-                "schedule_link VARCHAR(1023) PRIMARY KEY"
+                "schedule_link VARCHAR(1023) PRIMARY KEY",
+                "links_collected INTEGER"
             ]
         },
         {
@@ -136,7 +137,10 @@ DATABASE_SCHEMA = {
                 "winning_pitcher VARCHAR(1023)",
                 "losing_pitcher VARCHAR(1023)",
                 "saving_pitcher VARCHAR(1023)",
-                "weather_description VARCHAR(1023)"
+                "weather_description VARCHAR(1023)",
+                "download_state VARCHAR(15)",
+                "parse_version INTEGER",
+                "content_hash VARCHAR(64)"
             ]
         },
         {
@@ -175,7 +179,7 @@ DATABASE_SCHEMA = {
                 "intentional_bases_on_balls INTEGER",
                 "hit_by_pitch INTEGER",
                 "hitting_strike_outs INTEGER",
-                "grounded_into_douple_play INTEGER",
+                "grounded_into_double_play INTEGER",
                 "plate_appearances INTEGER",
                 "doubles INTEGER",
                 "triples INTEGER",
@@ -222,6 +226,65 @@ DATABASE_SCHEMA = {
                 "link VARCHAR(1023) PRIMARY KEY"
             ]
         },
+        {
+            "name": "player_season_record",
+            "columns": [
+                "player_link VARCHAR(1023)",
+                "year INTEGER",
+                "games INTEGER DEFAULT 0",
+                "at_bats INTEGER DEFAULT 0",
+                "runs_scored INTEGER DEFAULT 0",
+                "hits INTEGER DEFAULT 0",
+                "runs_batted_in INTEGER DEFAULT 0",
+                "bases_on_balls INTEGER DEFAULT 0",
+                "intentional_bases_on_balls INTEGER DEFAULT 0",
+                "hit_by_pitch INTEGER DEFAULT 0",
+                "hitting_strike_outs INTEGER DEFAULT 0",
+                "grounded_into_double_play INTEGER DEFAULT 0",
+                "plate_appearances INTEGER DEFAULT 0",
+                "doubles INTEGER DEFAULT 0",
+                "triples INTEGER DEFAULT 0",
+                "home_runs INTEGER DEFAULT 0",
+                "strikes_seen INTEGER DEFAULT 0",
+                "pitches_seen INTEGER DEFAULT 0",
+                "outs_pitched INTEGER DEFAULT 0",
+                "hits_allowed INTEGER DEFAULT 0",
+                "runs_allowed INTEGER DEFAULT 0",
+                "earned_runs_allowed INTEGER DEFAULT 0",
+                "home_runs_allowed INTEGER DEFAULT 0",
+                "bases_on_balls_allowed INTEGER DEFAULT 0",
+                "pitching_strike_outs INTEGER DEFAULT 0",
+                "batters_faced INTEGER DEFAULT 0",
+                "pitches_thrown INTEGER DEFAULT 0",
+                "strikes_total INTEGER DEFAULT 0",
+                "strikes_contact INTEGER DEFAULT 0",
+                "strikes_swinging INTEGER DEFAULT 0",
+                "strikes_looking INTEGER DEFAULT 0",
+                "ground_balls INTEGER DEFAULT 0",
+                "fly_balls INTEGER DEFAULT 0",
+                "line_drives INTEGER DEFAULT 0",
+                "inherited_runners INTEGER DEFAULT 0",
+                "put_outs INTEGER DEFAULT 0",
+                "assists INTEGER DEFAULT 0",
+                "double_plays INTEGER DEFAULT 0",
+                "errors INTEGER DEFAULT 0"
+            ]
+        },
+        {
+            "name": "team_season_record",
+            "columns": [
+                "team_name VARCHAR(125)",
+                "year INTEGER",
+                "games INTEGER DEFAULT 0",
+                "wins INTEGER DEFAULT 0",
+                "losses INTEGER DEFAULT 0",
+                "runs_scored INTEGER DEFAULT 0",
+                "runs_allowed INTEGER DEFAULT 0",
+                "hits INTEGER DEFAULT 0",
+                "errors INTEGER DEFAULT 0",
+                "left_on_base INTEGER DEFAULT 0"
+            ]
+        },
         {
             "name": "umpire_game_record",
             "columns": [
@@ -230,11 +293,89 @@ DATABASE_SCHEMA = {
                 "position VARCHAR(15)"
             ]
         }
+    ],
+    # Lookups made while reading boxscores, so they stay fast
+    # no matter how many games are in the database
+    # Rows read from a boxscore are found by game record id or boxscore
+    # link when a page is read again, so those are always kept
+    # Deferred indexes are only for queries after loading, bulk loads
+    # leave them off until the load is done
+    "indexes": [
+        {
+            "name": "boxscore_html_path",
+            "table": "boxscore",
+            "columns": ["html_path"]
+        },
+        {
+            "name": "player_game_record_game",
+            "table": "player_game_record",
+            "columns": ["game_record_id", "player_link"]
+        },
+        {
+            "name": "player_game_record_player",
+            "table": "player_game_record",
+            "columns": ["player_link"],
+            "deferred": True
+        },
+        {
+            "name": "inning_score_game",
+            "table": "inning_score",
+            "columns": ["game_record_id"]
+        },
+        {
+            "name": "umpire_game_record_boxscore",
+            "table": "umpire_game_record",
+            "columns": ["boxscore_link"]
+        },
+        # Season totals are found by these as each game is added
+        {
+            "name": "player_season_record_key",
+            "table": "player_season_record",
+            "columns": ["player_link", "year"],
+            "unique": True
+        },
+        {
+            "name": "team_season_record_key",
+            "table": "team_season_record",
+            "columns": ["team_name", "year"],
+            "unique": True
+        }
     ]
 }
 
 
+# Download state of a boxscore link
+DOWNLOAD_PENDING = 'pending'
+DOWNLOAD_SAVED = 'saved'
+
+# Connection settings for bulk loads, trades durability for speed
+# A crash during a bulk load can corrupt the database, so only use
+# them when the load can be started over
+BULK_PRAGMAS = [
+    'journal_mode=MEMORY',
+    'synchronous=OFF',
+    # Negative is kilobytes, 256MB
+    'cache_size=-262144',
+    'mmap_size=1073741824',
+    'temp_store=MEMORY',
+]
+
+
 # Common functions
+def __add_missing_columns(cursor, table):
+    # Databases made before a column was added to the schema
+    # Add any of those columns so old databases keep working
+    table_name = table['name']
+    cursor.execute('PRAGMA table_info(%s)' % table_name)
+    existing = set(row[1] for row in cursor.fetchall())
+    for column in table['columns']:
+        column_name = column.split(' ')[0]
+        if column_name in existing:
+            continue
+        # Cant add primary keys to existing tables, these are never new
+        log.info("Adding column:%s to table:%s" % (column_name, table_name))
+        cursor.execute('ALTER TABLE %s ADD COLUMN %s' % (table_name, column))
+
 def __create_table(cursor, table):
     log.info("Creating table:%s" % table)
     column_list = table['columns']
@@ -249,16 +390,57 @@ def __create_table(cursor, table):
     except sqlite3.OperationalError as e:
         # Assume table exists
         log.error("Cannot create table:%s, %s" % (table_name, e))
+        __add_missing_columns(cursor, table)
 
-def create_tables(cursor):
+def create_indexes(cursor, deferred=True):
+    for index in DATABASE_SCHEMA['indexes']:
+        if index.get('deferred') and not deferred:
+            continue
+        log.debug("Creating index:%s" % index['name'])
+        query = 'CREATE %sINDEX IF NOT EXISTS %s ON %s(%s)' % \
+                ('UNIQUE ' if index.get('unique') else '', index['name'],
+                 index['table'], ', '.join(index['columns']))
+        cursor.execute(query)
+
+def create_tables(cursor, bulk=False):
     tables = DATABASE_SCHEMA['tables']
     for table in tables:
         __create_table(cursor, table)
+    # Bulk loads build deferred indexes once they are done
+    create_indexes(cursor, deferred=not bulk)
+
+def boxscore_link(key):
+    ''' Link for a boxscore key, such as BOS201404010
+        Keys are the file name of the page, first 3 letters are the team '''
+    return '%s/boxes/%s/%s.shtml' % (URL_PREFIX, key[:3], key)
+
+def __start_bulk_load(cursor):
+    for pragma in BULK_PRAGMAS:
+        cursor.execute('PRAGMA %s' % pragma)
+    # Every insert would have to update these, build them once at the end
+    for index in DATABASE_SCHEMA['indexes']:
+        if index.get('deferred'):
+            cursor.execute('DROP INDEX IF EXISTS %s' % index['name'])
+
+def __finish_bulk_load(cursor):
+    log.info('Bulk load done, building indexes')
+    create_indexes(cursor)
+    # Stats for the query planner, tables are very different now
+    cursor.execute('ANALYZE')
+    cursor.connection.commit()
 
 @contextmanager
-def connect_sql(database_file):
+def connect_sql(database_file, bulk=False):
+    ''' Bulk uses fast unsafe settings and leaves deferred indexes off
+        Use create_tables(cursor, bulk=True) with it
+        Indexes are built and tables analyzed once everything is done,
+        if the load fails the next create_tables builds them '''
     with sqlite3.connect(database_file) as conn:
+        if bulk:
+            __start_bulk_load(conn.cursor())
         try:
             yield conn
         finally:
             conn.commit()
+        if bulk:
+            __finish_bulk_load(conn.cursor())
@@ -1,19 +1,67 @@
 import argparse
 import logging
+import time
 
+import read_score
+
+from client import archive
 from client import download
+from client import fetch
+from client import persist
+from client import ratelimit
+from client import soup
+from client import timing
 from client import utils
 
+def year_range(value):
+    # Either a single year, or a range like 1990-2025
+    try:
+        if '-' in value:
+            start, end = value.split('-')
+            return range(int(start), int(end) + 1)
+        return [int(value)]
+    except ValueError:
+        raise argparse.ArgumentTypeError('Invalid year or range:%s' % value)
+
 def parse_args():
     p = argparse.ArgumentParser(description='Download boxscores')
-    p.add_argument('year', type=int, help='Year to download')
-    p.add_argument('save_dir',
+    p.add_argument('years', type=year_range, nargs='+',
+                   help='Years to download, such as 2014 or 1990-2025')
+    p.add_argument('--save-dir',
                    help='Directory to Save Results',
-                   nargs='?',
                    default='boxscores/')
     p.add_argument('--database',
                    default='boxscores.sql',
                    help='Database file to use')
+    p.add_argument('--bulk', action='store_true',
+                   help='Fast unsafe database settings for large loads, '
+                        'indexes only used by queries are built at the end')
+    p.add_argument('--workers', type=int, default=4,
+                   help='Number of boxscore pages to download at once')
+    p.add_argument('--engine', default=fetch.ENGINE_THREADS,
+                   choices=fetch.ENGINES,
+                   help='Download with a pool of threads, or async on one event loop')
+    p.add_argument('--rate', type=float, default=5.0,
+                   help='Requests per second to start at, adjusts to the site')
+    p.add_argument('--max-rate', type=float, default=50.0,
+                   help='Never go over this many requests per second')
+    p.add_argument('--retries', type=int, default=ratelimit.DEFAULT_RETRIES,
+                   help='Times to retry a page before skipping it')
+    p.add_argument('--timeout', type=float, default=30,
+                   help='Seconds to wait on the site before giving up')
+    p.add_argument('--archive', default=archive.ARCHIVE_DIRECTORY,
+                   choices=archive.ARCHIVE_KINDS,
+                   help='Save pages as plain files, in compressed packs, '
+                        'or not at all with --ingest')
+    p.add_argument('--ingest', action='store_true',
+                   help='Read each boxscore into the database as it downloads')
+    p.add_argument('--parser', default=soup.DEFAULT_PARSER, choices=soup.PARSERS,
+                   help='HTML parser to build pages with, lxml is fastest')
+    p.add_argument('--profile',
+                   help='With --ingest, write time and calls for each stage '
+                        'and kind of statement to this file, as json')
+    p.add_argument('--resume', action='store_true',
+                   help='Skip pages a previous run already saved')
     p.add_argument('--log', default='log', help='Logging file')
     return p.parse_args()
 
@@ -22,12 +70,40 @@ def main():
     logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s",
                         level=logging.DEBUG,
                         filename=args['log'])
-    with utils.connect_sql(args['database']) as sql_connection:
+    with utils.connect_sql(args['database'], bulk=args['bulk']) as sql_connection:
         cursor = sql_connection.cursor()
-        utils.create_tables(cursor)
-        client = download.DownloadClient(args['year'])
-        client.collect_teams_and_schedules(cursor)
-        client.collect_team_games(cursor, args['save_dir'])
+        utils.create_tables(cursor, bulk=args['bulk'])
+        rate = ratelimit.RateLimiter(rate=args['rate'],
+                                     max_rate=args['max_rate'])
+        ingest = None
+        if args['ingest']:
+            persist.preload_known(cursor)
+            if args['profile']:
+                timing.enable()
+            def ingest(text, cursor, link):
+                read_score.read_page(text, timing.cursor(cursor), link,
+                                     parser=args['parser'])
+        elif args['archive'] == archive.ARCHIVE_NONE:
+            raise SystemExit('Pages must be archived unless using --ingest')
+        # All years share one pool and connection
+        years = sorted(set(y for years in args['years'] for y in years))
+        client = download.DownloadClient(years,
+                                          workers=args['workers'],
+                                          timeout=args['timeout'],
+                                          resume=args['resume'],
+                                          archive_kind=args['archive'],
+                                          engine=args['engine'],
+                                          rate=rate,
+                                          retries=args['retries'],
+                                          ingest=ingest,
+                                          parser=args['parser'])
+        start = time.time()
+        client.collect_all(cursor, args['save_dir'])
+        if args['ingest'] and args['profile']:
+            # Only pages read into the database are timed, not downloads
+            read_score.write_profile(args['profile'], timing.disable(),
+                                     seconds=time.time() - start,
+                                     parser=args['parser'])
 
 if __name__ == '__main__':
     main()
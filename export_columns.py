@@ -0,0 +1,27 @@
+import argparse
+
+from client import export
+from client import utils
+
+def parse_args():
+    a = argparse.ArgumentParser(description='Write player game records as '
+                                            'column files numpy can memory map')
+    a.add_argument('output', help='Directory to write column files and manifest to')
+    a.add_argument('--chunk-size', type=int, default=10000,
+                   help='Number of rows read from the database at a time')
+    a.add_argument('--database',
+                   help='Database file to use',
+                   default='boxscores.sql')
+    return a.parse_args()
+
+def main():
+    args = vars(parse_args())
+    with utils.connect_sql(args['database']) as sql_connection:
+        cursor = sql_connection.cursor()
+        manifest = export.export_player_games(cursor, args['output'],
+                                              chunk_size=args['chunk_size'])
+        print 'Exported %d rows, %d columns' % (manifest['rows'],
+                                                len(manifest['columns']))
+
+if __name__ == '__main__':
+    main()
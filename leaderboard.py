@@ -0,0 +1,75 @@
+import argparse
+
+from client import export
+from client import leaders
+from client import store
+from client import utils
+
+def date_number(text):
+    ''' YYYY-MM-DD as YYYYMMDD '''
+    year, month, day = text.split('-')
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+def parse_args():
+    a = argparse.ArgumentParser(description='Leaderboards for batting and pitching stats')
+    a.add_argument('stat', choices=leaders.STATS,
+                   help='Rate stat or any stat column, added up')
+    a.add_argument('--start', type=date_number,
+                   help='First day of games to include, YYYY-MM-DD')
+    a.add_argument('--end', type=date_number,
+                   help='Last day of games to include, YYYY-MM-DD')
+    a.add_argument('--year', type=int,
+                   help='Only include games in year, same as start and end')
+    a.add_argument('--teams', nargs='+',
+                   help='Only include games played for these teams')
+    a.add_argument('--min-pa', type=int, default=0,
+                   help='Plate appearances needed for batting rate stats')
+    a.add_argument('--min-ip', type=float, default=0,
+                   help='Innings pitched needed for pitching rate stats')
+    a.add_argument('--limit', type=int, default=10,
+                   help='Number of players to show')
+    a.add_argument('--columns', default='columns',
+                   help='Directory of column files, see export_columns.py')
+    a.add_argument('--export', action='store_true',
+                   help='Export column files from the database first, '
+                        'done anyway if there are none or the database '
+                        'changed since')
+    a.add_argument('--database',
+                   help='Database file to use',
+                   default='boxscores.sql')
+    return a.parse_args()
+
+def main():
+    args = vars(parse_args())
+    if args['year'] is not None:
+        args['start'] = args['year'] * 10000 + 101
+        args['end'] = args['year'] * 10000 + 1231
+    with utils.connect_sql(args['database']) as sql_connection:
+        cursor = sql_connection.cursor()
+        if args['export'] or not export.is_current(cursor, args['columns']):
+            print 'Exporting columns to:%s' % args['columns']
+            export.export_player_games(cursor, args['columns'])
+        lines = leaders.Lines(args['columns'])
+        leaderboard = leaders.leaderboard(lines, args['stat'],
+                                          start=args['start'], end=args['end'],
+                                          teams=args['teams'],
+                                          min_pa=args['min_pa'],
+                                          min_ip=args['min_ip'],
+                                          limit=args['limit'])
+        print '%-4s %-30s %10s %6s %6s %8s' % ('rank', 'player', args['stat'],
+                                               'g', 'pa', 'ip')
+        for (count, leader) in enumerate(leaderboard):
+            name = store.select_one(cursor, 'player', ['first_name', 'last_name'],
+                                    'link', leader.player_link)
+            name = ' '.join(name) if name else leader.player_link
+            value = '%10.3f' % leader.value
+            if leader.value.is_integer():
+                value = '%10d' % leader.value
+            # Innings pitched shown as whole and outs, 6.2 is 6 innings 2 outs
+            outs = int(round(leader.innings_pitched * 3))
+            print '%-4d %-30s %s %6d %6d %6d.%d' % \
+                (count + 1, name[:30].encode('utf-8'), value, leader.games,
+                 leader.plate_appearances, outs // 3, outs % 3)
+
+if __name__ == '__main__':
+    main()
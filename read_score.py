@@ -1,7 +1,24 @@
 import argparse
-from bs4 import BeautifulSoup
+from client import archive
+from client import persist
+from client import records
+from client import seasons
+from client import soup
+from client import store
+from client import timing
 from client import utils
-import sqlite3
+import cPickle
+import cProfile
+import glob
+import hashlib
+import json
+import multiprocessing
+import time
+import traceback
+
+# Bump when parsing changes what is saved for a page, so every page
+# already read is read again
+PARSE_VERSION = 1
 
 def __check_blank(stringy):
     if stringy == '':
@@ -49,53 +66,20 @@ def next_sibling(item, repeat=1):
             item = item.next_sibling
     return item
 
-def __ensure_player(cursor, name, link):
-    first_name, last_name = __first_last_name(name)
-    query = 'INSERT INTO player(first_name, last_name, link) VALUES' \
-            ' ("%s","%s","%s")' %  (first_name, last_name, link)
-    try:
-        cursor.execute(query)
-    except sqlite3.IntegrityError:
-        # Player already exists
-        return
-
-def __ensure_manager(cursor, name, link):
-    first_name, last_name = __first_last_name(name)
-    query = 'INSERT INTO manager(first_name, last_name, link)' \
-            ' VALUES ("%s", "%s", "%s")' %  (first_name, last_name, link)
-    try:
-        cursor.execute(query)
-    except sqlite3.IntegrityError:
-        # Manager already exists
-        return
+def __person(name, link):
+    # Values kept in records are plain unicode, strings from the page
+    # link back to the whole tree
+    first_name, last_name = __first_last_name(unicode(name))
+    return records.Person(first_name=first_name, last_name=last_name,
+                          link=link)
 
-def __ensure_player_game(cursor, player_link, game_record):
-    #Check if player_game_record exists
-    query = 'SELECT * FROM player_game_record WHERE player_link="%s"' \
-            ' AND game_record_id=%d' %  (player_link, game_record)
-    cursor.execute(query)
-    result = cursor.fetchall()
-    if len(result) == 0:
-        #If not create
-        query = 'INSERT INTO player_game_record(game_record_id, player_link)'\
-                ' VALUES(%d, "%s")' % (game_record, player_link)
-        cursor.execute(query)
-
-def __update_player_record(cursor, player_link, game_record,
-                           key, value):
-    db_key = utils.EXTRA_PLAYER[key]
+def __update_player_record(line, key, value):
     # Update player record
-    query = 'UPDATE player_game_record SET %s=%s' % (db_key, value)
-    query += ' WHERE player_link="%s" AND'\
-            ' game_record_id=%d' % (player_link, game_record)
-    cursor.execute(query)
+    setattr(line, utils.EXTRA_PLAYER[key], value)
 
-def __update_team_record(cursor, game_record, key, value):
-    db_key = utils.EXTRA_TEAM[key]
+def __update_team_record(team, key, value):
     # Update team record
-    query = 'UPDATE team_game_record SET %s=%s' % (db_key, value)
-    query += ' WHERE id=%d' % game_record
-    cursor.execute(query)
+    setattr(team, utils.EXTRA_TEAM[key], value)
 
 def __get_proper_time(time_data):
     date_data = time_data.split(',')
@@ -170,10 +154,10 @@ def __parse_meta(data):
     meta['field'] = field
     return meta
 
-def __team_data(data, cursor):
+def __team_data(data, game):
     team = dict()
     #Team name always a span
-    team_shortname = data.find('span').contents[0]
+    team_shortname = unicode(data.find('span').contents[0])
     #Get info from div in TEAM ORDER
     for (count, i) in enumerate(data.find_all('div')):
         if utils.TEAM_ORDER[count]:
@@ -183,37 +167,27 @@ def __team_data(data, cursor):
     #Get specific manager information
     manager_url = utils.URL_PREFIX + manager.attrs['href']
     manager_name = manager.contents[0]
-
-    #Check for manager before continuing
-    __ensure_manager(cursor, manager_name, manager_url)
+    game.add_manager(__person(manager_name, manager_url))
 
     #Create a game record
-    query = 'INSERT INTO team_game_record(team_name, score, manager) VALUES' \
-            ' ("%s", %d, "%s")' % (team_shortname, score, manager_url)
-    cursor.execute(query)
-    #Return primary id to update boxscore table
-    return cursor.lastrowid
+    return records.TeamLine(team_name=team_shortname, score=score,
+                            manager=manager_url)
 
-def __parse_linescore(data_list, record_id, cursor):
+def __parse_linescore(data_list, team):
     #Parse specific information from linescore
     #Team url always ref of first object
-    team_url = utils.URL_PREFIX + next_element(data_list[0]).attrs['href']
+    team.team_link = utils.URL_PREFIX + next_element(data_list[0]).attrs['href']
 
     #Remove blanks to only get score numbers
-    #Then create one entry for each inning
+    #Then keep one score for each inning
     innings = data_list[1]
     inn = innings.split(' ')
-    best_innings = []
     for i in inn:
         if __check_blank(i):
             continue
         if i == 'X':
             continue
-        best_innings.append(int(i))
-    for (count, i) in enumerate(best_innings):
-        query = 'INSERT INTO inning_score(game_record_id, inning, score) '\
-                'VALUES (%d, %d, %d)' % (record_id, count + 1, i)
-        cursor.execute(query)
+        team.innings.append(int(i))
 
     #Format here [Runs][Hits][Errors]
     #Get only ints and grab hits and errors
@@ -221,14 +195,10 @@ def __parse_linescore(data_list, record_id, cursor):
     other = data_list[2].next_element
     o = other.split(' ')
     o = [int(i) for i in o if not __check_blank(i)]
-    hits = o[1]
-    errors = o[2]
+    team.hits = o[1]
+    team.errors = o[2]
 
-    query = 'UPDATE team_game_record SET team_link="%s",hits=%d,errors=%d '\
-            'WHERE ID=%d' % (team_url, hits, errors, record_id)
-    cursor.execute(query)
-
-def generate_page_meta(page_data, cursor, boxscore_link):
+def generate_page_meta(page_data, game):
     # Find out of town table
     out_of_town = page_data.find('table', {'class' : 'stats_table'})
     # Current game is always next table after
@@ -237,30 +207,19 @@ def generate_page_meta(page_data, cursor, boxscore_link):
     data = next_element(current_meta, repeat=2)
     # Parse that data
     meta = __parse_meta(data)
-    query = 'UPDATE boxscore set date="%s",attendance=%s,game_time=%s,'\
-            'field_used="%s" where link="%s"' % (meta['date'], meta['attendance'],\
-             meta['game_time'], meta['field'], boxscore_link)
-    query = query.replace('None', 'NULL')
-    cursor.execute(query)
+    game.date = meta['date']
+    game.attendance = meta['attendance']
+    game.game_time = meta['game_time']
+    game.field_used = meta['field']
 
     #Get all of the team data
     team_meta = current_meta.find_all('td', {'align' : 'center'})[0]
     away_team = next_element(team_meta, repeat=2)
     home_team = next_sibling(away_team, repeat=2)
 
-    #Parse data into team record
-    #Update boxscore with both records
-    away = __team_data(away_team, cursor)
-    #Away returned here is the away team_game_record.id
-    query = 'UPDATE boxscore SET away_team_game_record=%d where link="%s"' % \
-            (away, boxscore_link)
-    cursor.execute(query)
-
-    home = __team_data(home_team, cursor)
-    #Home returned here is the home team_game_record.id
-    query = 'UPDATE boxscore SET home_team_game_record=%d where link="%s"' % \
-            (home, boxscore_link)
-    cursor.execute(query)
+    #Parse data into team records
+    game.away = __team_data(away_team, game)
+    game.home = __team_data(home_team, game)
 
     #Pitching data ( W/L/S ) will be next td sibling
     pitching_data = next_sibling(home_team)
@@ -272,10 +231,8 @@ def generate_page_meta(page_data, cursor, boxscore_link):
         #Name in contents, unique link in href
         name = pitcher_info.contents[0]
         url = utils.URL_PREFIX + pitcher_info.attrs['href']
-        __ensure_player(cursor, name, url)
-        query = 'UPDATE boxscore SET %s="%s" WHERE link="%s"' % \
-                (utils.PITCHER_ORDER[count], url, boxscore_link)
-        cursor.execute(query)
+        game.add_player(__person(name, url))
+        setattr(game, utils.PITCHER_ORDER[count], url)
 
     #Find linescore
     linescore = team_meta.find('pre', id='linescore')
@@ -289,12 +246,12 @@ def generate_page_meta(page_data, cursor, boxscore_link):
     #Format always ends with [teamlink][score-info][r-h-e] for each
     #So last 6 entries always same
     score_info = linescore[-6:]
-    __parse_linescore(score_info[0:3], away, cursor)
-    __parse_linescore(score_info[3:6], home, cursor)
-    return away, home
+    __parse_linescore(score_info[0:3], game.away)
+    __parse_linescore(score_info[3:6], game.home)
+    return game.away, game.home
 
-def __player_box(cursor, player_data, all_columns, good_columns,
-                 record_id, pitcher=False, hitter=False):
+def __player_box(player_data, all_columns, good_columns,
+                 game, team, pitcher=False, hitter=False):
     #Player hitting box scores
     #Go through all columns ( td )
     #If data useful ( a good column ), save to player dict
@@ -327,80 +284,62 @@ def __player_box(cursor, player_data, all_columns, good_columns,
     #Player name
     player_name = player_dict['player'].find('a').contents[0]
     # Ensure player already exists
-    __ensure_player(cursor, player_name, player_url)
-    #Check for player game record
-    __ensure_player_game(cursor, player_url, record_id)
+    game.add_player(__person(player_name, player_url))
+    #Player line is shared if player is in hitting and pitching boxes
+    line = team.player_line(player_url)
+    line.fielding_pos = pos
 
-    #Start to build query
     #First arg always fucking weird
     #For hitters, at bats
     #For pitchers, innings pitched
     if hitter:
         key = 'ab'
         try:
-            first = int(next_element(player_dict[key], repeat=2))
+            line.at_bats = int(next_element(player_dict[key], repeat=2))
         except TypeError:
             #Pitchers/ some hitters wont have this
-            first = None
-        #Build query
-        query = 'UPDATE player_game_record SET fielding_pos="%s",at_bats=%s,' \
-                  % (pos, first)
+            line.at_bats = None
     if pitcher:
         key = 'ip'
         try:
             first = float(next_element(player_dict[key], repeat=2))
-            whole = int(first)
-            part = int((first - int(first)) * 10)
-            query = 'UPDATE player_game_record SET fielding_pos="%s",' \
-                    'innings_pitched_whole=%d,innings_pitched_part=%d,' % (pos, whole, part)
-
+            line.innings_pitched_whole = int(first)
+            line.innings_pitched_part = int((first - int(first)) * 10)
         except TypeError:
             #Pitchers/ some hitters wont have this
-            first = None
-            query = 'UPDATE player_game_record SET fielding_pos="%s",' \
-                    % (pos)
+            pass
     #Build from rest of values
     rest_cols = set(good_columns) - set(['player'])
     if pitcher:
         rest_cols = rest_cols - set(['ip'])
+        columns = utils.BOXSCORE_PITCHING
     if hitter:
         rest_cols = rest_cols - set(['ab'])
-    #Best dictionary from these values
+        columns = utils.BOXSCORE_HITTING
     for col in rest_cols:
         try:
-            player_dict[col] = int(next_element(player_dict[col]))
+            value = int(next_element(player_dict[col]))
         #Some values will be blank
         except TypeError:
-            player_dict[col] = None
-    if hitter:
-        query += ','.join('%s=%s' % (utils.BOXSCORE_HITTING[m], player_dict[m]) \
-                          for m in rest_cols)
-    if pitcher:
-        query += ','.join('%s=%s' % (utils.BOXSCORE_PITCHING[m], player_dict[m]) \
-                          for m in rest_cols)
-    #Add values of which record to update
-    query += ' WHERE player_link="%s" AND game_record_id=%d' % \
-               (player_url, record_id)
-    query = query.replace('None', 'NULL')
-    cursor.execute(query)
-
-def __generate_box_data(cursor, box_count, page_data,
-                        all_columns, good_columns, record):
+            value = None
+        setattr(line, columns[col], value)
+
+def __generate_box_data(box_count, page_data, all_columns, good_columns,
+                        game, team):
     #Generate data for each boxscore
     #Go through ever player record
     for player in page_data.find_all('tr', {'class' : 'normal_text'})[1:]:
         #Get each players box score
         if box_count < 2:
-            __player_box(cursor, player, all_columns, good_columns,
-                         record, hitter=True)
+            __player_box(player, all_columns, good_columns, game, team,
+                         hitter=True)
             continue
         if box_count < 4:
-            __player_box(cursor, player, all_columns, good_columns,
-                         record, pitcher=True)
+            __player_box(player, all_columns, good_columns, game, team,
+                         pitcher=True)
             continue
 
-def __parse_lineup(cursor, page_data, away_record, home_record,
-                   all_columns, good_columns):
+def __parse_lineup(page_data, game, all_columns, good_columns):
     relevant_page = page_data.find('tbody')
     for line in relevant_page.find_all('tr'):
         #Each line contains two players
@@ -426,18 +365,13 @@ def __parse_lineup(cursor, page_data, away_record, home_record,
         except TypeError:
             away_bp = None
 
-        #Update the batting positions
-        query = 'UPDATE player_game_record SET batting_pos=%s WHERE player_link="%s" AND '\
-                'game_record_id=%d' % (home_bp, home_url, home_record)
-        query = query.replace('None', 'NULL')
-        cursor.execute(query)
+        #Update the batting positions, only players in the box scores
+        for (team, url, bp) in [(game.home, home_url, home_bp),
+                                (game.away, away_url, away_bp)]:
+            if url in team.players:
+                team.players[url].batting_pos = bp
 
-        query = 'UPDATE player_game_record SET batting_pos=%s WHERE player_link="%s" AND '\
-                'game_record_id=%d' % (away_bp, away_url, away_record)
-        query = query.replace('None', 'NULL')
-        cursor.execute(query)
-
-def box_summary(page_data, cursor, away, home):
+def box_summary(page_data, game):
     #First stats table always out of town scoreboard
     #Rest of box scores
     boxes = page_data.find_all('table', {'class' : 'stats_table'})[1:]
@@ -455,14 +389,14 @@ def box_summary(page_data, cursor, away, home):
         #Rest are player boxscores
         #Go through each block ( all in trs )
         if count % 2 == 0:
-            record = away
+            team = game.away
         else:
-            record = home
+            team = game.home
         #Generate the box data for each player
-        __generate_box_data(cursor, count, box, all_cols, good_cols, record)
+        __generate_box_data(count, box, all_cols, good_cols, game, team)
         #Since lineups are in a tbody value, will not be caught in loop above
         if count == 4:
-            __parse_lineup(cursor, box, away, home, all_cols, good_cols)
+            __parse_lineup(box, game, all_cols, good_cols)
 
 def __nice_player_string(player):
     # Remove whitespaces from front
@@ -488,65 +422,49 @@ def __find_numbers(player):
         return 1
     return int(s)
 
-def __find_player_url(cursor, player_names, team_record=None,
-                      away_record=None, home_record=None):
-    if team_record:
-        # If you have a team record, query directly from that team
-        query = 'select last_name, first_name,player_link  from player_game_record as r ' \
-                'join player as p on r.player_link=p.link' \
-                ' where game_record_id=%d' % team_record
-        cursor.execute(query)
-        result = cursor.fetchall()
-    elif home_record or away_record:
-        # If you don't, try from home and away records
-        query = 'select last_name, first_name,player_link  from player_game_record as r ' \
-                'join player as p on r.player_link=p.link' \
-                ' where game_record_id=%d' % away_record
-        cursor.execute(query)
-        result = cursor.fetchall()
-        team_record = away_record
-
+def __roster_index(game, team):
+    # Players in a team's box scores, keyed by (last name, first initial)
+    # Built once per game, so small text lookups are a dictionary hit
+    roster = dict()
+    for link in team.players:
+        player = game.players[link]
+        last = player.last_name.lower().replace(' ', '')
+        first = player.first_name.lower()
+        roster.setdefault((last, first[:1]), []).append(player)
+    return roster
+
+def __find_player_url(rosters, player_names, team):
     # Names will be [Initial] [Last name]
-    # Look up by last name, also check initial
-    # First split name
+    # Look up by last name and initial, also check all of first name given
     links = []
     for name in player_names:
         n = name.encode('utf-8').replace('\xc2', '').replace('\xa0', ' ')
         split_name = n.split(' ')
         first_initial = split_name[0].lower()
         last_name = split_name[1].lower()
-
-        # Then compare against all players in result
-        for player in result:
-            # Get args from query
-            last = player[0].lower().replace(' ', '')
-            first = player[1].lower()
-            link = player[2]
-            # Compare last names, then first
-            if last_name == last:
-                if first.startswith(first_initial):
-                    links.append(link)
-                    break
-    return links, team_record
-
-def __parse_subfield(subfield, cursor, away_record, home_record):
-    record = None
-    team = ''
+        for player in rosters[team].get((last_name, first_initial[:1]), []):
+            if player.first_name.lower().startswith(first_initial):
+                links.append(player.link)
+                break
+    return links
+
+def __parse_subfield(subfield, game, rosters):
+    team = None
+    team_name = ''
     try:
         # Key denotes stat to update for a player
         # Data is a a list of all players with that stat
         key = subfield.attrs['id'].lower()
-        # Find team record for key
+        # Find team for key
         # 'vistor' or 'home' will be in the key_name
-        if record is None:
-            if 'visitor' in key:
-                record = away_record
-                team = 'visitor'
-            elif 'home' in key:
-                record = home_record
-                team = 'home'
+        if 'visitor' in key:
+            team = game.away
+            team_name = 'visitor'
+        elif 'home' in key:
+            team = game.home
+            team_name = 'home'
         # Remove 'home' or 'visitor' from string
-        key = key.replace(team, '')
+        key = key.replace(team_name, '')
         # If not a skipable key, get the data
         if key not in utils.SMALL_TEXT_SKIP:
             # Get all data in string
@@ -569,23 +487,19 @@ def __parse_subfield(subfield, cursor, away_record, home_record):
                 players = __nice_player_string(player)
                 # May not need to find player
                 # Could just be number in string that was removed
-                links = None
                 if players:
-                    links, record = __find_player_url(cursor,
-                                                      players,
-                                                      team_record=record,
-                                                      away_record=away_record,
-                                                      home_record=home_record)
-                    for link in links:
-                        __update_player_record(cursor, link, record,
-                                               key, num)
+                    # Without a team, look through the away team
+                    if team is None:
+                        team = game.away
+                    for link in __find_player_url(rosters, players, team):
+                        __update_player_record(team.players[link], key, num)
                 else:
-                    __update_team_record(cursor, record, key, num)
+                    __update_team_record(team, key, num)
     except KeyError:
         # If it doesnt have an id its useless
         return
 
-def __parse_boxscore_trailers(field, cursor, boxscore_link):
+def __parse_boxscore_trailers(field, game):
     field_id = field.attrs['id']
     field_content = next_element(field, repeat=3)
     if field_id.lower() == 'umpires':
@@ -594,63 +508,292 @@ def __parse_boxscore_trailers(field, cursor, boxscore_link):
             ump = ump.rstrip('.')
             pos = ump.split('-')[0].lstrip(' ').rstrip(' ')
             name = ump.split('-')[1].lstrip(' ').rstrip('.').rstrip(' ')
-            query = 'INSERT INTO umpire_game_record(name, position, boxscore_link)'
-            query += ' VALUES ("%s", "%s", "%s")' % (name, pos, boxscore_link)
-            cursor.execute(query)
+            game.umpires.append(records.Umpire(name=name, position=pos))
 
     elif field_id.lower() == 'weather':
         stringy = field_content.rstrip('.')
         stringy = stringy.lstrip(' ')
-        query = 'UPDATE boxscore SET weather_description="%s" WHERE link="%s"' % (stringy, boxscore_link)
-        cursor.execute(query)
+        game.weather_description = stringy
 
-def parse_small_text(page_data, cursor, away_record, home_record,
-                     boxscore_link):
+def parse_small_text(page_data, game):
     # Additional data such as fielding and baserunning info is in small text
+    # Box scores are all read by now, index both rosters once
+    rosters = {game.away : __roster_index(game, game.away),
+               game.home : __roster_index(game, game.home)}
     # Go through each div field
     for field in page_data.find_all('div', {'class' : 'small_text'}):
         # Each field will have additional divs
         # These divs denote values to update for players
         all_divs = field.find_all('div')
 
-        # Record will be same for each item in subfield
-        # Set to none, then only check if none
         for subfield in all_divs:
-            __parse_subfield(subfield,
-                             cursor,
-                             away_record,
-                             home_record)
+            __parse_subfield(subfield, game, rosters)
         # Some fields to not have divs, such as umpires
         # If they have an id, they are still of use
         if len(all_divs) == 0 and 'id' in field.attrs:
-            __parse_boxscore_trailers(field, cursor, boxscore_link)
+            __parse_boxscore_trailers(field, game)
 
-def read_file(file_name, cursor):
+def __find_link(file_name, cursor):
     # Find html link from the file_name
     # Use this link to identify box score
-    query = 'SELECT link FROM boxscore WHERE html_path LIKE "%'
-    query += file_name + '%"'
-    cursor.execute(query)
-    result_link = cursor.fetchone()[0]
+    # Look up the exact path, then the link for the page key in case
+    # the page moved since it was downloaded
+    link = store.link_for_path(cursor, archive.normalize(file_name))
+    if link is None:
+        link = utils.boxscore_link(archive.page_key(file_name))
+        if not store.has_boxscore(cursor, link):
+            raise KeyError('No boxscore for file:%s' % file_name)
+    return link
+
+def read_file(file_name, cursor, parser=None):
+    result_link = __find_link(file_name, cursor)
     print 'Reading data from file:%s' % file_name
 
-    with open(file_name, 'r') as f:
-        data = f.read()
-    soup = BeautifulSoup(data)
-    page_data = soup.find('div', id='page_content')
+    # Page can be a plain file or in a pack archive
+    with timing.stage('read'):
+        data = archive.read_page(file_name)
+    return read_page(data, cursor, result_link, parser=parser)
+
+def __content_hash(data):
+    # Pages downloaded are unicode, pages read from files are utf-8
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+def __unchanged(state, content_hash):
+    # State is from store.parse_state, page was read before by this
+    # version of the parser and has not changed since
+    if state is None or state[2] is None:
+        return False
+    return state[0] == PARSE_VERSION and state[1] == content_hash
+
+def parse_page(data, boxscore_link, parser=None):
+    # Parse html already in memory into a game, nothing is written
+    # Only page content is ever read, so only that is parsed
+    with timing.stage('tree'):
+        page = soup.make_soup(data, parser=parser, only=soup.BOXSCORE_CONTENT)
+        page_data = page.find('div', id='page_content')
+    game = records.Game(link=boxscore_link, parse_version=PARSE_VERSION,
+                        content_hash=__content_hash(data))
 
     print 'Getting home, away metadata'
-    away, home = generate_page_meta(page_data, cursor, result_link)
+    with timing.stage('page_meta'):
+        generate_page_meta(page_data, game)
 
     print 'Getting box summarys'
-    box_summary(page_data, cursor, away, home)
+    with timing.stage('box_summary'):
+        box_summary(page_data, game)
 
     print 'Parsing small text'
-    parse_small_text(page_data, cursor, away, home, result_link)
+    with timing.stage('small_text'):
+        parse_small_text(page_data, game)
+    return game
+
+def read_page(data, cursor, boxscore_link, parser=None):
+    # Parse html already in memory for the boxscore with this link
+    # Returns False if page was skipped, it was already read unchanged
+    if __unchanged(store.parse_state(cursor, boxscore_link), __content_hash(data)):
+        print 'Skipping unchanged boxscore:%s' % boxscore_link
+        return False
+    game = parse_page(data, boxscore_link, parser=parser)
+    with timing.stage('save'):
+        persist.save_game(cursor, game)
+    return True
+
+def find_files(names):
+    # Expand globs, directories and pack archives into single pages
+    files = []
+    for name in names:
+        matches = [name]
+        if not name.startswith(archive.PACK_PREFIX) and glob.has_magic(name):
+            matches = sorted(glob.glob(name))
+        for match in matches:
+            files += archive.find_pages(match)
+    return files
+
+def unparsed_files(cursor):
+    # Every downloaded boxscore not read into the database yet
+    return store.unparsed_paths(cursor)
+
+def __worker_report():
+    # Timings of one page in a worker, None if not profiling
+    recorded = timing.disable()
+    return recorded.report() if recorded else None
+
+def __parse_game(job):
+    # Runs in a worker process, game is handed back to be written
+    # so only the main process writes the database
+    # No game and no error means the page was skipped
+    # Game is pickled here, so a game that cant be sent back is an error
+    # for its file, everything handed back is plain data
+    # When profiling, timings for the page are handed back too
+    file_name, link, parser, state, profile = job
+    if profile:
+        timing.enable()
+    try:
+        print 'Reading data from file:%s' % file_name
+        with timing.stage('read'):
+            data = archive.read_page(file_name)
+        if __unchanged(state, __content_hash(data)):
+            print 'Skipping unchanged boxscore:%s' % link
+            return file_name, None, None, __worker_report()
+        game = parse_page(data, link, parser=parser)
+        return file_name, cPickle.dumps(game, cPickle.HIGHEST_PROTOCOL), None, \
+            __worker_report()
+    except Exception:
+        return file_name, None, traceback.format_exc(), __worker_report()
+
+def __parallel_pages(file_names, cursor, processes, parser):
+    # Pages are parsed into games by a pool of processes
+    # Games are written here
+    def failed(error):
+        def write(cursor):
+            raise Exception(error)
+        return write
+
+    def written(game):
+        def write(cursor):
+            with timing.stage('save'):
+                persist.save_game(cursor, game)
+            return True
+        return write
+
+    def skipped(cursor):
+        return False
+
+    jobs = []
+    for file_name in file_names:
+        try:
+            link = __find_link(file_name, cursor)
+            jobs.append((file_name, link, parser, store.parse_state(cursor, link),
+                         timing.timings is not None))
+        except KeyError:
+            # No boxscore row for this file
+            yield file_name, failed('No boxscore for file:%s' % file_name)
+    # Files not handed back yet
+    pending = set(job[0] for job in jobs)
+    # Results that could not be handed back
+    errors = []
+    pool = multiprocessing.Pool(processes)
+    try:
+        # One page per task, a result the pool cant send back is only
+        # that page's, and the rest keep coming
+        results = pool.imap_unordered(__parse_game, jobs)
+        for _ in jobs:
+            try:
+                file_name, game, error, report = results.next()
+            except Exception:
+                errors.append(traceback.format_exc())
+                continue
+            pending.discard(file_name)
+            if report:
+                timing.timings.merge(report)
+            if error:
+                yield file_name, failed(error)
+            elif game is None:
+                yield file_name, skipped
+            else:
+                yield file_name, written(cPickle.loads(game))
+        pool.close()
+        # Only files never handed back are the ones that failed
+        for file_name in file_names:
+            if file_name in pending:
+                pending.discard(file_name)
+                yield file_name, failed('\n'.join(errors))
+    finally:
+        pool.terminate()
+        pool.join()
+
+def read_files(file_names, cursor, batch_size=100, processes=1, parser=None):
+    # Read many files with one connection, committing every batch_size
+    # Each file is in a savepoint, so a bad file only undoes itself
+    # With more than one process, pages are parsed in worker processes
+    # and only this process writes to the database
+    # Pages already read, and unchanged since, are skipped
+    # Returns number of files read, number skipped, and files that failed
+    # While profiling, every statement is timed
+    cursor = timing.cursor(cursor)
+    if processes > 1:
+        pages = __parallel_pages(file_names, cursor, processes, parser)
+    else:
+        pages = ((file_name,
+                  lambda cursor, f=file_name: read_file(f, cursor, parser=parser)) \
+                 for file_name in file_names)
+    persist.preload_known(cursor)
+    connection = cursor.connection
+    # Handle transactions here, the sqlite3 module commits on SAVEPOINT
+    isolation_level = connection.isolation_level
+    connection.commit()
+    connection.isolation_level = None
+    read = 0
+    skipped = 0
+    failed = []
+    try:
+        cursor.execute('BEGIN')
+        for (count, (file_name, write)) in enumerate(pages):
+            cursor.execute('SAVEPOINT read_file')
+            try:
+                written = write(cursor)
+            except Exception:
+                print 'Error reading file:%s' % file_name
+                traceback.print_exc()
+                cursor.execute('ROLLBACK TO read_file')
+                failed.append(file_name)
+            except BaseException:
+                # Interrupted part way through a game, such as by Ctrl-C
+                # Nothing of the batch can be committed on the way out,
+                # a half saved game would look read and never be read again
+                cursor.execute('ROLLBACK TO read_file')
+                cursor.execute('ROLLBACK')
+                raise
+            else:
+                if written:
+                    read += 1
+                else:
+                    skipped += 1
+            cursor.execute('RELEASE read_file')
+            if (count + 1) % batch_size == 0:
+                cursor.execute('COMMIT')
+                cursor.execute('BEGIN')
+        cursor.execute('COMMIT')
+    finally:
+        connection.isolation_level = isolation_level
+    return read, skipped, failed
+
+def write_profile(file_name, timings, **totals):
+    # Timings report plus totals for the whole run, such as files read
+    report = timings.report()
+    report.update(totals)
+    with open(file_name, 'w') as f:
+        json.dump(report, f, indent=4, sort_keys=True)
+    print 'Profile written to:%s' % file_name
 
 def parse_args():
     a = argparse.ArgumentParser(description='Read HTML into JSON')
-    a.add_argument('file_name', help='File to read')
+    a.add_argument('file_names', nargs='*',
+                   help='Files to read, can be directories, globs, '
+                        'pack archives or pack:// locations')
+    a.add_argument('--unparsed', action='store_true',
+                   help='Read every downloaded boxscore not read yet')
+    a.add_argument('--batch-size', type=int, default=100,
+                   help='Number of files to read between commits')
+    a.add_argument('--processes', type=int, default=1,
+                   help='Number of processes parsing pages, '
+                        'one process always does all the writing')
+    a.add_argument('--parser', default=soup.DEFAULT_PARSER, choices=soup.PARSERS,
+                   help='HTML parser to build pages with, lxml is fastest')
+    a.add_argument('--bulk', action='store_true',
+                   help='Fast unsafe database settings for large loads, '
+                        'indexes only used by queries are built at the end')
+    a.add_argument('--rebuild-seasons', action='store_true',
+                   help='Add up season totals again from every game, '
+                        'needed once for databases made before season totals')
+    a.add_argument('--profile',
+                   help='Write time and calls for each stage and kind of '
+                        'statement to this file, as json')
+    a.add_argument('--profile-dump',
+                   help='Write cProfile stats to this file, '
+                        'only the main process is profiled')
     a.add_argument('--database',
                    help='Database file to use',
                    default='boxscores.sql')
@@ -661,10 +804,36 @@ def parse_args():
 
 def main():
     args = vars(parse_args())
-    with utils.connect_sql(args['database']) as sql_connection:
+    with utils.connect_sql(args['database'], bulk=args['bulk']) as sql_connection:
         cursor = sql_connection.cursor()
-        utils.create_tables(cursor)
-        read_file(args['file_name'], cursor)
+        utils.create_tables(cursor, bulk=args['bulk'])
+        file_names = find_files(args['file_names'])
+        if args['unparsed']:
+            file_names += unparsed_files(cursor)
+        if args['profile']:
+            timing.enable()
+        profiler = None
+        if args['profile_dump']:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.time()
+        read, skipped, failed = read_files(file_names, cursor,
+                                  batch_size=args['batch_size'],
+                                  processes=args['processes'],
+                                  parser=args['parser'])
+        seconds = time.time() - start
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args['profile_dump'])
+        print 'Read %d files, %d unchanged, %d failed' % (read, skipped, len(failed))
+        for file_name in failed:
+            print 'Failed:%s' % file_name
+        if args['profile']:
+            write_profile(args['profile'], timing.disable(), seconds=seconds,
+                          read=read, skipped=skipped, failed=len(failed),
+                          processes=args['processes'], parser=args['parser'])
+        if args['rebuild_seasons']:
+            seasons.rebuild(cursor)
 
 if __name__ == '__main__':
     main()